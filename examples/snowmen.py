@@ -4,7 +4,7 @@ from solid import *
 import solid_state
 
 
-@solid_state.state("snowman")
+@solid_state.state("snowman", as_module=True)
 def create_snowman(height):
     bottom = height / 9 * 4
     middle = height / 9 * 3
@@ -47,20 +47,18 @@ def create_spiral_snowmen():
     )
 
 
-# def create_top_hat(snowman):
-#     # TODO
-#     # - allow for get_attributes without a path to indicate current object
-#     snowman_height = solid_state.get_attributes(snowman).get("height")
-#     brim_diameter = snowman_height / 9 * 3
+# def create_top_hat(snowman_bounds):
+#     # size the hat from the top of the snowman's bounds
+#     (x0, y0, _), (x1, y1, snowman_height) = snowman_bounds
+#     brim_diameter = min(x1 - x0, y1 - y0) / 3
 #     brim_height = snowman_height / 18
-#     diameter = snowman_height / 9 * 2
+#     diameter = brim_diameter / 3 * 2
 #     height = diameter * 2
 #
 #     return solid_state.pipe(
 #         cylinder(h=height, d=diameter) + cylinder(h=brim_height, d=brim_diameter),
 #         solid_state.save_state("top_hat", dict(height=height)),
-#         translate([0, 0, snowman_height]),
-#         translate_like(snowman),
+#         translate([(x0 + x1) / 2, (y0 + y1) / 2, snowman_height]),
 #     )
 
 
@@ -75,8 +73,8 @@ def create_spiral_snowmen():
 scene = create_spiral_snowmen()
 
 
-# for snowman in get_objects(scene, "spiral_snowmen.snowman"):
-#     scene += create_top_hat(snowman)
+# for snowman_bounds in solid_state.get_bounds(scene, ".spiral_snowmen .snowman"):
+#     scene += create_top_hat(snowman_bounds)
 
 
 # scad_render_to_file(scene, "snowmen.scad")
@@ -1,19 +1,66 @@
 __version__ = '0.1.0'
 
 
+from .aio import (
+    get_attributes_async,
+    get_object_async,
+    get_objects_async,
+    get_transformations_async,
+    render_scad_async,
+    render_scad_text_async,
+)
+from .cache import (
+    RenderCache,
+)
+from .export import (
+    ExportResult,
+    export_scad,
+)
+from .frozen import (
+    FrozenScene,
+    freeze,
+    thaw,
+)
 from .lookup import(
     get_attributes,
+    get_bounds,
     get_name,
     get_object,
     get_objects,
     get_transformations,
+    prune,
+    replace,
     transform_like,
+    update_attributes,
+)
+from .overlaps import (
+    Overlap,
+    find_overlaps,
+)
+from .parallel import (
+    parallel_map,
 )
 from .render import (
-    render_scad
+    render_scad,
+    render_scad_text,
+    scad_text,
+)
+from .scad_reader import (
+    count_scad_objects,
+    get_scad_objects,
+    scan_scad,
+)
+from .serialize import (
+    dump_scene,
+    load_scene,
+)
+from .stats import (
+    StateStats,
+    scene_stats,
 )
 from .solid_state import (
     compose,
+    instrument,
     join,
     pipe,
     save_state,
@@ -0,0 +1,127 @@
+import asyncio
+import contextlib
+import functools
+import os
+import tempfile
+import threading
+
+import solid
+
+import solid_state.lookup as lookup
+import solid_state.render as render
+
+
+# Asyncio versions of the rendering and lookup functions, for use from an
+# event loop. CPU bound work runs in the given executor, or the loop's
+# default executor if None. A ProcessPoolExecutor avoids the GIL, in which
+# case passing a FrozenScene keeps the cost of sending the scene down.
+#
+# Every function takes an optional asyncio.Semaphore, shared between calls
+# to limit how many run at once.
+#
+# A RenderCache is sent to a ProcessPoolExecutor as a copy, so the caller's
+# cache never gets the entries, hits or misses from that render. Only a
+# cache with a directory is shared, through the files it writes.
+
+
+@contextlib.asynccontextmanager
+async def _limit(semaphore):
+    if semaphore is None:
+        yield
+    else:
+        async with semaphore:
+            yield
+
+
+async def _run(executor, semaphore, func, *args, **kwargs):
+    async with _limit(semaphore):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
+
+
+def _write_file(file_path, text, cancelled):
+    # Write to a temporary file first so a cancelled or failed render never
+    # leaves a partial file behind.
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".scad.tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            # scad_render_to_file ends with the source of the module calling
+            # it, which for render_scad is always solid_state.render
+            f.write(solid.solidpython.sp_code_in_scad_comment(render.__file__))
+
+        if not cancelled.is_set():
+            os.replace(tmp_path, file_path)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+async def render_scad_async(scad_obj, file_path, selector=None, exclude=None, transform=True, colorize=True, color_scheme="solid_state.colors:default", annotate=False, cache=None, modules=False, executor=None, semaphore=None):
+    """
+    Same as render_scad, and writes the same text. The SCAD code is generated
+    in the executor and written to file in a separate thread. If the task is
+    cancelled before writing finishes the file is left untouched.
+    """
+    async with _limit(semaphore):
+        text = await _run(
+            executor,
+            None,
+            render.render_scad_text,
+            scad_obj,
+            selector=selector,
+            exclude=exclude,
+            transform=transform,
+            colorize=colorize,
+            color_scheme=color_scheme,
+            annotate=annotate,
+            cache=cache,
+            modules=modules,
+        )
+
+        cancelled = threading.Event()
+        try:
+            await asyncio.to_thread(_write_file, file_path, text, cancelled)
+
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    return file_path
+
+
+async def render_scad_text_async(scad_obj, selector=None, exclude=None, transform=True, colorize=True, color_scheme="solid_state.colors:default", annotate=False, cache=None, modules=False, executor=None, semaphore=None):
+    return await _run(
+        executor,
+        semaphore,
+        render.render_scad_text,
+        scad_obj,
+        selector=selector,
+        exclude=exclude,
+        transform=transform,
+        colorize=colorize,
+        color_scheme=color_scheme,
+        annotate=annotate,
+        cache=cache,
+        modules=modules,
+    )
+
+
+async def get_objects_async(scad_obj, query, exclude=None, executor=None, semaphore=None):
+    return await _run(executor, semaphore, lookup.get_objects, scad_obj, query, exclude)
+
+
+async def get_object_async(scad_obj, query, exclude=None, executor=None, semaphore=None):
+    return await _run(executor, semaphore, lookup.get_object, scad_obj, query, exclude)
+
+
+async def get_attributes_async(scad_obj, query=None, executor=None, semaphore=None):
+    return await _run(executor, semaphore, lookup.get_attributes, scad_obj, query)
+
+
+async def get_transformations_async(scad_obj, query, exclude=None, executor=None, semaphore=None):
+    return await _run(executor, semaphore, lookup.get_transformations, scad_obj, query, exclude)
@@ -0,0 +1,399 @@
+import math
+import weakref
+
+import numpy as np
+
+
+# Axis aligned bounding boxes of every object in a FrozenScene, as an array
+# of shape (N, 2, 3) holding the lowest and highest corner of each object in
+# world coordinates. Objects without any geometry have NaN bounds.
+#
+# Bounds are conservative: an object is never larger than its box, but the
+# box can be larger than the object, ex. for rotated spheres or objects which
+# are only partly removed by a difference. Objects whose size isn't known,
+# ex. imported files, text, surfaces or anything else not handled below, are
+# unbounded, with infinite bounds which carry over to their ancestors.
+
+
+_PRIMITIVES = {"cube", "square", "sphere", "circle", "cylinder", "polyhedron", "polygon"}
+_TRANSFORMS = {"translate", "scale", "rotate", "mirror", "multmatrix"}
+# Bounds are the union of the children's, except for difference and
+# intersection which are handled separately
+_GROUPS = {"union", "difference", "intersection", "hull", "color", "render", "part", "hole", "assign"}
+# Bounds are computed from the children's bounds in the object's own
+# coordinates
+_OPERATIONS = {"linear_extrude", "rotate_extrude", "resize", "offset", "projection", "minkowski"}
+
+_scene_bounds = weakref.WeakKeyDictionary()
+
+
+def _value(params, key, default):
+    value = params.get(key)
+    return default if value is None else value
+
+
+def _vector(value, size=3, fill=0.0):
+    """
+    A number or vector of any length as a vector of the given size. Numbers
+    are repeated, shorter vectors are padded with fill.
+    """
+    if np.ndim(value) == 0:
+        return np.full(size, float(value))
+
+    vector = np.asarray(value, dtype=float).ravel()[:size]
+    return np.concatenate((vector, np.full(size - len(vector), fill)))
+
+
+def _vectors(values, size=3, fill=0.0):
+    """
+    _vector for a list of values at once, as an array of shape (N, size).
+    """
+    try:
+        array = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        array = None
+
+    # a mix of numbers and vectors, or vectors of different lengths
+    if array is None or array.ndim > 2:
+        return np.array([_vector(v, size, fill) for v in values]).reshape(-1, size)
+
+    if array.ndim == 1:
+        return np.repeat(array[:, None], size, axis=1)
+
+    array = array[:, :size]
+    return np.pad(array, ((0, 0), (0, size - array.shape[1])), constant_values=fill)
+
+
+def _column(params, key, default):
+    return np.array([_value(p, key, default) for p in params], dtype=float)
+
+
+def _flags(params, key):
+    return np.array([bool(p.get(key)) for p in params])
+
+
+def _radii(params, r_key, d_key, default):
+    """
+    Radius of each object from its radius or diameter param, or the
+    default for that object if it has neither.
+    """
+    default = np.broadcast_to(np.asarray(default, dtype=float), (len(params),))
+    return np.array([
+        p[d_key] / 2 if p.get(d_key) is not None else _value(p, r_key, d)
+        for p, d in zip(params, default.tolist())
+    ], dtype=float)
+
+
+def _axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=float)
+    norm = np.linalg.norm(axis)
+    if norm == 0:
+        return np.eye(3)
+
+    x, y, z = axis / norm
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    return np.array([
+        [c + x * x * (1 - c), x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+        [y * x * (1 - c) + z * s, c + y * y * (1 - c), y * z * (1 - c) - x * s],
+        [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, c + z * z * (1 - c)],
+    ])
+
+
+def _local_matrix(name, params):
+    """
+    4x4 matrix of a rotate, mirror or multmatrix object, following OpenSCAD.
+    """
+    matrix = np.eye(4)
+
+    if name == "rotate":
+        a = _value(params, "a", 0)
+        if np.ndim(a) == 0:
+            matrix[:3, :3] = _axis_angle(_value(params, "v", [0, 0, 1]), a)
+        else:
+            x, y, z = _vector(a)
+            matrix[:3, :3] = (
+                _axis_angle([0, 0, 1], z) @ _axis_angle([0, 1, 0], y) @ _axis_angle([1, 0, 0], x)
+            )
+
+    elif name == "mirror":
+        normal = _vector(_value(params, "v", 0))
+        if (length := normal @ normal) > 0:
+            matrix[:3, :3] -= 2 * np.outer(normal, normal) / length
+
+    elif name == "multmatrix":
+        m = np.asarray(params["m"], dtype=float)[:3, :4]
+        matrix[:m.shape[0], :m.shape[1]] = m
+
+    return matrix
+
+
+def _points_box(points):
+    points = np.asarray(points, dtype=float)
+    if points.size == 0:
+        return None
+
+    lo = _vector(points.min(axis=0))
+    hi = _vector(points.max(axis=0))
+    return lo, hi
+
+
+def _primitive_boxes(name, params):
+    """
+    Bounds of a batch of primitives with the same name in their own
+    coordinates, as arrays of shape (N, 3). 2D primitives lie in the z = 0
+    plane.
+    """
+    n = len(params)
+
+    if name in ("cube", "square"):
+        size = _vectors([_value(p, "size", 1) for p in params], size=3 if name == "cube" else 2)
+        size = _vectors(size)
+        center = _flags(params, "center")[:, None]
+        return np.where(center, -size / 2, 0), np.where(center, size / 2, size)
+
+    if name in ("sphere", "circle"):
+        r = _radii(params, "r", "d", 1)
+        lo = -np.stack((r, r, r if name == "sphere" else np.zeros(n)), axis=1)
+        return lo, -lo
+
+    # cylinder
+    r = _radii(params, "r", "d", 1)
+    r = np.maximum(_radii(params, "r1", "d1", r), _radii(params, "r2", "d2", r))
+    h = _column(params, "h", 1)
+    z = np.where(_flags(params, "center"), -h / 2, 0)
+    return np.stack((-r, -r, z), axis=1), np.stack((r, r, z + h), axis=1)
+
+
+def _operation_box(name, params, lo, hi):
+    """
+    Bounds of an operation in its own coordinates, from the bounds of its
+    children. For minkowski, lo and hi are the sums of the children's.
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+
+    if name == "rotate_extrude":
+        r = max(abs(lo[0]), abs(hi[0]))
+        return np.array([-r, -r, lo[1]]), np.array([r, r, hi[1]])
+
+    if name == "linear_extrude":
+        scale = _vector(_value(params, "scale", 1), size=2)
+        lo_xy = np.minimum(lo[:2], lo[:2] * scale)
+        hi_xy = np.maximum(hi[:2], hi[:2] * scale)
+        if _value(params, "twist", 0):
+            r = np.linalg.norm(np.maximum(np.abs(lo_xy), np.abs(hi_xy)))
+            lo_xy = np.array([-r, -r])
+            hi_xy = np.array([r, r])
+
+        h = _value(params, "height", 100)
+        z = -h / 2 if params.get("center") else 0
+        return np.append(lo_xy, z), np.append(hi_xy, z + h)
+
+    if name == "resize":
+        # resize scales about the origin, axes with a new size of 0 are kept
+        # or, with auto, scaled along with the others
+        new_size = _vector(_value(params, "newsize", 0))
+        size = hi - lo
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factors = np.where((new_size > 0) & (size > 0), new_size / size, np.nan)
+
+        fill = 1.0
+        if np.any(_value(params, "auto", False)) and not np.isnan(factors).all():
+            fill = max(1.0, np.nanmax(factors))
+
+        factors = np.where(np.isnan(factors), fill, factors)
+        return lo * factors, hi * factors
+
+    if name == "offset":
+        grow = max(_value(params, "r", 0), _value(params, "delta", 0), 0)
+        lo[:2] -= grow
+        hi[:2] += grow
+        return lo, hi
+
+    if name == "projection":
+        lo[2] = hi[2] = 0
+        return lo, hi
+
+    # minkowski
+    return lo, hi
+
+
+def _transform_boxes(matrices, lo, hi):
+    """
+    Bounds of a batch of boxes after transforming each by its matrix.
+    Unbounded boxes stay unbounded.
+    """
+    rotation = matrices[:, :3, :3]
+    with np.errstate(invalid="ignore"):
+        center = (lo + hi) / 2
+        half = (hi - lo) / 2
+        center = np.einsum("nij,nj->ni", rotation, center) + matrices[:, :3, 3]
+        half = np.einsum("nij,nj->ni", np.abs(rotation), half)
+
+    lo = center - half
+    hi = center + half
+    unbounded = ~np.isfinite(lo).all(axis=1) | ~np.isfinite(hi).all(axis=1)
+    lo[unbounded] = -np.inf
+    hi[unbounded] = np.inf
+    return lo, hi
+
+
+def _levels(scene):
+    """
+    Object indices grouped by depth, starting from the root.
+    """
+    order = np.argsort(scene.depth, kind="stable")
+    return np.split(order, np.flatnonzero(np.diff(scene.depth[order])) + 1)
+
+
+def _name_mask(scene, names):
+    ids = [i for i, name in enumerate(scene.obj_name_table) if name in names]
+    return np.isin(scene.obj_names, ids)
+
+
+def scene_bounds(scene):
+    """
+    Get the bounds of every object in a FrozenScene. The result is cached
+    for as long as the scene exists.
+    """
+    if (bounds := _scene_bounds.get(scene)) is not None:
+        return bounds
+
+    size = len(scene)
+    names = scene.obj_name_table
+    levels = _levels(scene)
+    parent = scene.parent
+    operation = _name_mask(scene, _OPERATIONS)
+    minkowski = _name_mask(scene, {"minkowski"})
+    intersection = _name_mask(scene, {"intersection"})
+
+    matrices = np.broadcast_to(np.eye(4), (size, 4, 4)).copy()
+    translate = np.flatnonzero(_name_mask(scene, {"translate"}))
+    if len(translate):
+        matrices[translate, :3, 3] = _vectors([_value(scene.params[i], "v", 0) for i in translate])
+
+    scale = np.flatnonzero(_name_mask(scene, {"scale"}))
+    if len(scale):
+        factors = _vectors([_value(scene.params[i], "v", 1) for i in scale], fill=1.0)
+        matrices[scale[:, None], np.arange(3), np.arange(3)] = factors
+
+    for i in np.flatnonzero(_name_mask(scene, {"rotate", "mirror", "multmatrix"})):
+        matrices[i] = _local_matrix(names[scene.obj_names[i]], scene.params[i])
+
+    # Objects inside an operation are placed relative to it, since their
+    # bounds are needed in its coordinates. frames holds the matrix from each
+    # object's coordinates to the world, or to the enclosing operation, and
+    # world the matrix to the world.
+    frames = matrices.copy()
+    world = matrices.copy()
+    enclosing = np.full(size, -1, dtype=np.int32)
+    for level in levels[1:]:
+        parents = parent[level]
+        base = frames[parents]
+        base[operation[parents]] = np.eye(4)
+        frames[level] = base @ matrices[level]
+        world[level] = world[parents] @ matrices[level]
+        enclosing[level] = np.where(operation[parents], parents, enclosing[parents])
+
+    lo = np.full((size, 3), np.inf)
+    hi = np.full((size, 3), -np.inf)
+
+    # primitives are bounded a name at a time, except for points based ones
+    for name in ("cube", "square", "sphere", "circle", "cylinder"):
+        primitives = np.flatnonzero(_name_mask(scene, {name}))
+        if len(primitives):
+            box_lo, box_hi = _primitive_boxes(name, [scene.params[i] for i in primitives])
+            lo[primitives], hi[primitives] = _transform_boxes(frames[primitives], box_lo, box_hi)
+
+    for i in np.flatnonzero(_name_mask(scene, {"polyhedron", "polygon"})):
+        if (box := _points_box(scene.params[i]["points"])) is not None:
+            lo[i], hi[i] = _transform_boxes(frames[i:i + 1], box[0][None], box[1][None])
+
+    unknown = ~_name_mask(scene, _PRIMITIVES | _TRANSFORMS | _GROUPS | _OPERATIONS)
+    lo[unknown] = -np.inf
+    hi[unknown] = np.inf
+
+    # Objects which don't add to their parent: everything but the first
+    # child of a difference (which always directly follows its parent) and
+    # holes, which are removed further up the tree
+    index = np.arange(size)
+    differences = _name_mask(scene, {"difference"})
+    skipped = np.zeros(size, dtype=bool)
+    skipped[1:] = differences[parent[1:]] & (parent[1:] != index[1:] - 1)
+    for i, extra in scene.extras.items():
+        skipped[i] |= bool(extra.get("is_hole"))
+
+    # children of operations and intersections are collected separately,
+    # minkowski adds up the bounds of its children
+    inner_lo = np.full((size, 3), np.inf)
+    inner_hi = np.full((size, 3), -np.inf)
+    common_lo = np.full((size, 3), -np.inf)
+    common_hi = np.full((size, 3), np.inf)
+    sum_lo = np.zeros((size, 3))
+    sum_hi = np.zeros((size, 3))
+    sum_count = np.zeros(size, dtype=np.int64)
+
+    for level in reversed(levels):
+        for i in level[operation[level]]:
+            if minkowski[i]:
+                if not sum_count[i]:
+                    continue
+                box_lo, box_hi = sum_lo[i], sum_hi[i]
+
+            elif (inner_lo[i] <= inner_hi[i]).all():
+                box_lo, box_hi = inner_lo[i], inner_hi[i]
+
+            else:
+                continue
+
+            box_lo, box_hi = _operation_box(names[scene.obj_names[i]], scene.params[i], box_lo, box_hi)
+            lo[i], hi[i] = _transform_boxes(frames[i:i + 1], box_lo[None], box_hi[None])
+
+        common = level[intersection[level] & (scene.first_child[level] != -1)]
+        lo[common] = common_lo[common]
+        hi[common] = common_hi[common]
+
+        level = level[(parent[level] != -1) & ~skipped[level]]
+        parents = parent[level]
+
+        into = minkowski[parents] & (lo[level] <= hi[level]).all(axis=1)
+        np.add.at(sum_lo, parents[into], lo[level[into]])
+        np.add.at(sum_hi, parents[into], hi[level[into]])
+        np.add.at(sum_count, parents[into], 1)
+
+        into = operation[parents] & ~minkowski[parents]
+        np.minimum.at(inner_lo, parents[into], lo[level[into]])
+        np.maximum.at(inner_hi, parents[into], hi[level[into]])
+
+        into = intersection[parents]
+        np.maximum.at(common_lo, parents[into], lo[level[into]])
+        np.minimum.at(common_hi, parents[into], hi[level[into]])
+
+        into = ~operation[parents] & ~intersection[parents]
+        np.minimum.at(lo, parents[into], lo[level[into]])
+        np.maximum.at(hi, parents[into], hi[level[into]])
+
+    empty = ~(lo <= hi).all(axis=1)
+
+    # bring objects inside operations into world coordinates
+    inside = np.flatnonzero((enclosing != -1) & ~empty)
+    if len(inside):
+        lo[inside], hi[inside] = _transform_boxes(world[enclosing[inside]], lo[inside], hi[inside])
+
+    bounds = np.stack((lo, hi), axis=1)
+    bounds[empty] = np.nan
+    bounds.setflags(write=False)
+
+    _scene_bounds[scene] = bounds
+    return bounds
+
+
+def within_mask(scene, box):
+    """
+    Mask of all objects whose bounds lie entirely inside the box, given as
+    (x0, y0, z0, x1, y1, z1).
+    """
+    bounds = scene_bounds(scene)
+    with np.errstate(invalid="ignore"):
+        return (bounds[:, 0] >= box[:3]).all(axis=1) & (bounds[:, 1] <= box[3:]).all(axis=1)
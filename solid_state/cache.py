@@ -0,0 +1,125 @@
+import hashlib
+import marshal
+import os
+import weakref
+
+
+def _marshallable(value):
+    """
+    Copy of a value marshal can write, with anything it can't, ex. numpy
+    arrays, replaced by its bytes or repr.
+    """
+    if isinstance(value, (list, tuple)):
+        return type(value)(_marshallable(v) for v in value)
+
+    if isinstance(value, dict):
+        return {_marshallable(k): _marshallable(v) for k, v in value.items()}
+
+    if value is None or type(value) in (bool, int, float, str, bytes):
+        return value
+
+    if hasattr(value, "tobytes"):
+        return (type(value).__name__, str(getattr(value, "dtype", "")), value.tobytes())
+
+    return (type(value).__name__, repr(value))
+
+
+def _node(scad_obj):
+    """
+    Everything about a single object which affects its SCAD code. Params
+    are kept as they are, so objects whose params only differ in order or
+    in being rendered already, which swaps "segments" for "$fn", get
+    different fingerprints and are rendered again.
+    """
+    return (
+        scad_obj.name,
+        scad_obj.modifier,
+        scad_obj.is_hole,
+        scad_obj.is_part_root,
+        scad_obj.params,
+        scad_obj.traits,
+        len(scad_obj.children),
+    )
+
+
+class RenderCache:
+    """
+    Cache of the rendered SCAD code of objects with solid_state names, keyed
+    by a hash of everything in the subtree which affects the output. When
+    given a directory the code is also kept on disk, so it can be reused
+    between runs.
+
+    Fingerprints are remembered for each object for as long as it exists,
+    so objects shouldn't be modified after they have been rendered with a
+    cache. Newly built objects are still fingerprinted, so a render with a
+    warm cache visits every object, but hashing one is several times
+    cheaper than rendering it.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.texts = {}
+        self.fingerprints = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, scad_obj):
+        """
+        Get a hash of an object and all of its children.
+        """
+        if (fingerprint := self.fingerprints.get(scad_obj)) is not None:
+            return fingerprint
+
+        # The whole subtree is hashed at once with marshal, which is much
+        # faster than repr, and in version 2 always writes equal values
+        # the same way. Objects inside with solid_state names are hashed
+        # again if they need their own fingerprint, which they only do when
+        # this one isn't in the cache.
+        nodes = []
+        stack = [scad_obj]
+        while stack:
+            obj = stack.pop()
+            nodes.append(_node(obj))
+            stack.extend(reversed(obj.children))
+
+        try:
+            data = marshal.dumps(nodes, 2)
+        except ValueError:
+            data = marshal.dumps(_marshallable(nodes), 2)
+
+        fingerprint = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self.fingerprints[scad_obj] = fingerprint
+        return fingerprint
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.scad")
+
+    def get(self, key):
+        text = self.texts.get(key)
+        if text is None and self.directory is not None:
+            try:
+                with open(self._path(key)) as f:
+                    text = self.texts[key] = f.read()
+
+            except FileNotFoundError:
+                pass
+
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return text
+
+    def set(self, key, text):
+        self.texts[key] = text
+
+        if self.directory is not None:
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+
+            os.replace(tmp_path, self._path(key))
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
+import dataclasses
 import importlib
+import json
+import shlex
 import sys
 import types
 
@@ -32,17 +35,10 @@ def parse_target_args(target, raw):
     return args
 
 
-@click.command()
-# TODO use package.module:function syntax instead
-@click.argument("target") # TODO better name for target, and make it an option again
-@click.option("--module", "-m")
-@click.option("--output", "-o")
-@click.option("--selector", "-s", default=None)
-@click.option("--colorize/--no-colorize", default=True)
-@click.option("--color-scheme", "-c", default="solid_state.colors:default")
-@click.option("--transform/--no-transform", default=True)
-@click.option("--arg", "-a", multiple=True, default=[])
-def main(target, module, output, selector, colorize, color_scheme, transform, arg):
+def import_target(target):
+    """
+    Import the module of a target in form package.module:var and get var.
+    """
     try:
         target_package, target_name = target.split(":")
     except ValueError:
@@ -56,13 +52,19 @@ def main(target, module, output, selector, colorize, color_scheme, transform, ar
         sys.exit(1)
 
     target_module = importlib.import_module(target_package)
-    target_var = getattr(target_module, target_name)
+    return getattr(target_module, target_name)
 
+
+def build_target(target_var, arg):
+    """
+    Get the OpenSCADObject for a target var, calling it with the given
+    "key=value" arguments if it is a function.
+    """
     if isinstance(target_var, solid.OpenSCADObject):
         target_object = target_var
 
     elif isinstance(target_var, types.FunctionType):
-        target_object = target_var(**parse_target_args(target_var, args))
+        target_object = target_var(**parse_target_args(target_var, arg))
 
         if not isinstance(target_object, solid.OpenSCADObject):
             raise ValueError(
@@ -80,15 +82,140 @@ def main(target, module, output, selector, colorize, color_scheme, transform, ar
             )
         )
 
-    solid_state.render_scad(
+    return target_object
+
+
+def load_target(target, arg):
+    """
+    Get the OpenSCADObject for a target in form package.module:var, calling
+    var with the given "key=value" arguments if it is a function.
+    """
+    return build_target(import_target(target), arg)
+
+
+class _DefaultGroup(click.Group):
+    """
+    Group which runs the render command when no other command is given, so
+    "solid-state package.module:var" keeps working.
+    """
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ("--help", "-h"):
+            args = ["render", *args]
+
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup)
+def main():
+    pass
+
+
+@main.command()
+# TODO use package.module:function syntax instead
+@click.argument("target") # TODO better name for target, and make it an option again
+@click.option("--module", "-m")
+@click.option("--output", "-o")
+@click.option("--selector", "-s", default=None)
+@click.option("--exclude", "-e", default=None)
+@click.option("--colorize/--no-colorize", default=True)
+@click.option("--color-scheme", "-c", default="solid_state.colors:default")
+@click.option("--transform/--no-transform", default=True)
+@click.option("--annotate/--no-annotate", default=False)
+@click.option("--modules/--no-modules", default=False, help="Write objects of functions decorated with state(name, as_module=True) as OpenSCAD module calls")
+@click.option("--cache-dir", default=None, help="Reuse SCAD code of unchanged named objects from this directory")
+@click.option("--arg", "-a", multiple=True, default=[])
+@click.option("--export", "export_format", default=None, help="Convert the output with an external command, ex. stl")
+@click.option("--export-command", default=None, help="Command to export with, {input}, {output} and {format} are filled in")
+@click.option("--workers", "-j", type=int, default=None)
+@click.option("--timeout", type=float, default=None)
+@click.option("--retries", type=int, default=0)
+@click.option("--force/--no-force", default=False)
+@click.option("--check-overlaps", default=None, help="Stop if objects in these selector groups overlap, ex. \".bolt, .plate\"")
+def render(target, module, output, selector, exclude, colorize, color_scheme, transform, annotate, modules, cache_dir, arg, export_format, export_command, workers, timeout, retries, force, check_overlaps):
+    """
+    Render the target scene to a .scad file.
+    """
+    target_object = load_target(target, arg)
+
+    if check_overlaps is not None:
+        overlaps = solid_state.find_overlaps(target_object, check_overlaps, exclude)
+        for overlap in overlaps:
+            message = (
+                f"overlap: {overlap.first} {list(overlap.first_path)}"
+                f" and {overlap.second} {list(overlap.second_path)}"
+            )
+            if overlap.unbounded:
+                message += " (size unknown)"
+            click.echo(message, err=True)
+
+        if overlaps:
+            sys.exit(1)
+
+    output = solid_state.render_scad(
         scad_obj=target_object,
         file_path=output,
         selector=selector,
+        exclude=exclude,
         transform=transform,
         colorize=colorize,
         color_scheme=color_scheme,
+        annotate=annotate,
+        cache=None if cache_dir is None else solid_state.RenderCache(cache_dir),
+        modules=modules,
     )
 
+    if export_format is not None:
+        command = solid_state.export.DEFAULT_COMMAND
+        if export_command is not None:
+            command = shlex.split(export_command)
+
+        def _progress(result, finished, total):
+            message = f"[{finished}/{total}] {result.status} {result.output}"
+            if result.error:
+                message += f": {result.error}"
+            click.echo(message, err=True)
+
+        results = solid_state.export.export_scad(
+            [output],
+            export_format=export_format,
+            command=command,
+            workers=workers,
+            timeout=timeout,
+            retries=retries,
+            force=force,
+            progress=_progress,
+        )
+
+        if any(r.status == "failed" for r in results):
+            sys.exit(1)
+
+
+@main.command()
+@click.argument("target")
+@click.option("--arg", "-a", multiple=True, default=[])
+@click.option("--json", "json_output", is_flag=True, default=False)
+@click.option("--profile/--no-profile", default=True, help="Time state functions while building the target")
+def stats(target, arg, json_output, profile):
+    """
+    Report statistics for each solid_state name in the target scene.
+    """
+    # scenes built while importing the module aren't part of the target
+    target_var = import_target(target)
+    if profile:
+        with solid_state.instrument() as instrumentation:
+            target_object = build_target(target_var, arg)
+    else:
+        instrumentation = None
+        target_object = build_target(target_var, arg)
+
+    results = solid_state.scene_stats(target_object, instrumentation)
+
+    if json_output:
+        click.echo(json.dumps([dataclasses.asdict(s) for s in results], indent=2))
+    else:
+        click.echo(solid_state.stats.format_table(results))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,319 @@
+from dataclasses import dataclass
+import hashlib
+import inspect
+import math
+import numbers
+import operator
+import re
+
+import solid
+from solid.solidpython import py2openscad
+
+import solid_state.solid_state as solid_state
+
+
+# Functions decorated with state(name, as_module=True) are traced once with
+# a symbolic value for each parameter, and the SCAD code of the result is
+# used as the body of an OpenSCAD module. Arithmetic on the symbols builds
+# OpenSCAD expressions, anything else (comparisons, conversion to numbers,
+# math functions, ...) makes the function untraceable, in which case its
+# objects are rendered inline as usual.
+
+
+class _Untraceable(Exception):
+    pass
+
+
+def _mod(a, b):
+    # OpenSCAD's % keeps the sign of a, like fmod
+    if isinstance(a, _Symbol) or isinstance(b, _Symbol):
+        return a % b
+
+    return math.fmod(a, b)
+
+
+_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": _mod,
+}
+
+# operator precedence, lowest first
+_ADD = 1
+_MUL = 2
+_UNARY = 3
+_ATOM = 4
+
+
+def _operand(value, precedence, right=False):
+    if not isinstance(value, _Symbol):
+        if not isinstance(value, numbers.Real) or isinstance(value, bool):
+            raise _Untraceable(f"can't use {value!r} in an expression")
+
+        return py2openscad(value)
+
+    # a - (b - c) and a / (b / c) need brackets, a + (b + c) doesn't
+    if value.precedence < precedence or (right and value.precedence == precedence):
+        return f"({value.expression})"
+
+    return value.expression
+
+
+def _evaluate(value, values):
+    """
+    Value with every symbol in it replaced by its result for the given
+    parameter values.
+    """
+    if isinstance(value, _Symbol):
+        return value.evaluate(values)
+
+    if isinstance(value, (list, tuple)):
+        return type(value)(_evaluate(v, values) for v in value)
+
+    if isinstance(value, dict):
+        return {k: _evaluate(v, values) for k, v in value.items()}
+
+    return value
+
+
+class _Symbol:
+    """
+    Stand-in for a numeric parameter, which renders as the OpenSCAD
+    expression computed from it. evaluate computes the same expression in
+    Python from a dict of parameter values.
+    """
+
+    def __init__(self, expression, precedence=_ATOM, evaluate=None):
+        self.expression = expression
+        self.precedence = precedence
+        self.evaluate = evaluate or (lambda values: values[expression])
+
+    def __str__(self):
+        return self.expression
+
+    __repr__ = __str__
+    __hash__ = object.__hash__
+
+    def _binary(self, other, op, precedence, reverse=False):
+        left, right = (other, self) if reverse else (self, other)
+        func = _OPERATORS[op]
+        return _Symbol(
+            f"{_operand(left, precedence)} {op} {_operand(right, precedence, right=op in '-/%')}",
+            precedence,
+            lambda values: func(_evaluate(left, values), _evaluate(right, values)),
+        )
+
+    def __add__(self, other):
+        return self._binary(other, "+", _ADD)
+
+    def __radd__(self, other):
+        return self._binary(other, "+", _ADD, reverse=True)
+
+    def __sub__(self, other):
+        return self._binary(other, "-", _ADD)
+
+    def __rsub__(self, other):
+        return self._binary(other, "-", _ADD, reverse=True)
+
+    def __mul__(self, other):
+        return self._binary(other, "*", _MUL)
+
+    def __rmul__(self, other):
+        return self._binary(other, "*", _MUL, reverse=True)
+
+    def __truediv__(self, other):
+        return self._binary(other, "/", _MUL)
+
+    def __rtruediv__(self, other):
+        return self._binary(other, "/", _MUL, reverse=True)
+
+    def __mod__(self, other):
+        return self._binary(other, "%", _MUL)
+
+    def __rmod__(self, other):
+        return self._binary(other, "%", _MUL, reverse=True)
+
+    def __neg__(self):
+        return _Symbol(f"-{_operand(self, _UNARY)}", _UNARY, lambda values: -self.evaluate(values))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return _Symbol(f"abs({self.expression})", _ATOM, lambda values: abs(self.evaluate(values)))
+
+    def _untraceable(self, *args):
+        raise _Untraceable(f"'{self.expression}' is used as more than a number")
+
+    __bool__ = __float__ = __int__ = __index__ = __round__ = _untraceable
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _untraceable
+    __pow__ = __rpow__ = __floordiv__ = __rfloordiv__ = _untraceable
+
+
+def _params(scad_obj):
+    # rendering swaps "segments" for "$fn", so objects which have been
+    # rendered already still compare equal
+    return {"$fn" if k == "segments" else k: v for k, v in scad_obj.params.items()}
+
+
+def _same(a, b):
+    # instances inside other modules' bodies have symbols for values
+    if isinstance(a, _Symbol) or isinstance(b, _Symbol):
+        return str(a) == str(b)
+
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(map(_same, a, b))
+
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+
+    if isinstance(a, numbers.Real) and isinstance(b, numbers.Real):
+        return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+    try:
+        return bool(a == b)
+    except ValueError:
+        return False
+
+
+def _matches(body, scad_obj, values):
+    """
+    Whether a tree is what the traced body gives for the parameter values,
+    so it renders the same as a call to the module. Fails for instances
+    which were edited after they were created.
+    """
+    stack = [(body, scad_obj)]
+    while stack:
+        expected, obj = stack.pop()
+        try:
+            params = _evaluate(_params(expected), values)
+            traits = _evaluate(expected.traits, values)
+        except (ArithmeticError, _Untraceable):
+            return False
+
+        if (
+            expected.name != obj.name
+            or len(expected.children) != len(obj.children)
+            or vars(expected).keys() != vars(obj).keys()
+            or not _same(params, _params(obj))
+            or not _same(traits, obj.traits)
+            or not all(
+                _same(v, getattr(obj, k))
+                for k, v in vars(expected).items()
+                if k not in ("params", "traits", "children", "parent")
+            )
+        ):
+            return False
+
+        stack.extend(zip(expected.children, obj.children))
+
+    return True
+
+
+def _module_name(state_name):
+    name = re.sub(r"\W", "_", state_name)
+    # don't shadow OpenSCAD's own modules, or start with a digit
+    if hasattr(solid.objects, name) or name[0].isdigit():
+        name = f"solid_state_{name}"
+
+    # Names only depend on the solid_state name, since cached code calling
+    # them is reused between renders. Different solid_state names can give
+    # the same name once changed, so those get a hash of the original.
+    if name != state_name:
+        name += "_" + hashlib.blake2b(state_name.encode(), digest_size=4).hexdigest()
+
+    return name
+
+
+@dataclass
+class Module:
+    name: str
+    params: list
+    body: solid.OpenSCADObject
+
+
+def trace(state_name):
+    """
+    Trace the function registered for a solid_state name, returning None if
+    there isn't one or it can't be traced.
+    """
+    func = solid_state._modules.get(state_name)
+    if func is None:
+        return None
+
+    args = []
+    kwargs = {}
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            return None
+        elif param.kind == param.KEYWORD_ONLY:
+            kwargs[name] = _Symbol(name)
+        else:
+            args.append(_Symbol(name))
+
+    try:
+        body = func(*args, **kwargs)
+
+    # any error means the function needs real values
+    except Exception:
+        return None
+
+    if not isinstance(body, solid.OpenSCADObject):
+        return None
+
+    params = [*(a.expression for a in args), *kwargs]
+    return Module(_module_name(state_name), params, body)
+
+
+def _is_value(value):
+    return isinstance(value, _Symbol) or (
+        isinstance(value, numbers.Real) and not isinstance(value, bool)
+    )
+
+
+class Modules:
+    """
+    Modules used during a single render, traced the first time each
+    solid_state name is seen.
+    """
+
+    def __init__(self):
+        self.traced = {}
+        self.used = {}
+
+        # which functions are modules, and whether they trace, decides which
+        # objects render as calls, so it's part of the key of cached code
+        registered = sorted(
+            (name, func.__module__, func.__qualname__, func.__code__.co_code)
+            for name, func in solid_state._modules.items()
+        )
+        self.key = hashlib.blake2b(repr(registered).encode(), digest_size=8).hexdigest()
+
+    def call(self, scad_obj):
+        """
+        Get the module call which renders the same as an object with a
+        solid_state name, or None if it has to be rendered inline.
+        """
+        state = scad_obj.get_trait("solid_state")
+        name = state["name"]
+        if name not in self.traced:
+            self.traced[name] = trace(name)
+
+        module = self.traced[name]
+        if module is None:
+            return None
+
+        attributes = state.get("attributes") or {}
+        if (
+            list(attributes) != module.params
+            or not all(_is_value(v) for v in attributes.values())
+            or len(scad_obj.children) != 1
+            or not _matches(module.body, scad_obj.children[0], attributes)
+        ):
+            return None
+
+        self.used.setdefault(module.name, module)
+        args = ", ".join(f"{k} = {py2openscad(v)}" for k, v in attributes.items())
+        return f"{scad_obj.modifier}{module.name}({args});"
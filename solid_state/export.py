@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import subprocess
+import time
+from typing import Optional
+
+
+DEFAULT_COMMAND = ["openscad", "-o", "{output}", "{input}"]
+
+MANIFEST_NAME = ".solid_state_export.json"
+
+# First line of rendered files, which holds the render time
+_GENERATED_HEADER = b"// Generated by "
+
+
+@dataclass
+class ExportResult:
+    input: str
+    output: str
+    status: str  # "done", "skipped" or "failed"
+    attempts: int = 0
+    returncode: Optional[int] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+def _output_path(input_path, export_format):
+    return os.path.splitext(input_path)[0] + "." + export_format
+
+
+def _job_hash(input_path, command, export_format):
+    """
+    Hash of everything that determines the output of a job. The generated
+    header is left out, so re-rendering an unchanged scene isn't a change.
+    """
+    sha = hashlib.sha256()
+    sha.update(json.dumps([command, export_format]).encode())
+    with open(input_path, "rb") as f:
+        if f.read(len(_GENERATED_HEADER)) == _GENERATED_HEADER:
+            f.readline()
+        else:
+            f.seek(0)
+
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def _manifest_path(output_path):
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), MANIFEST_NAME)
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    os.replace(tmp_path, path)
+
+
+def _run_job(input_path, output_path, command, export_format, timeout, retries):
+    args = [
+        arg.format(input=input_path, output=output_path, format=export_format)
+        for arg in command
+    ]
+
+    start = time.monotonic()
+    result = ExportResult(input_path, output_path, "failed")
+    while result.attempts <= retries:
+        result.attempts += 1
+        try:
+            process = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+
+        except subprocess.TimeoutExpired:
+            result.returncode = None
+            result.error = f"timed out after {timeout}s"
+            continue
+
+        except OSError as e:
+            # the command itself can't be run, retrying won't help
+            result.error = str(e)
+            break
+
+        result.returncode = process.returncode
+        if process.returncode == 0:
+            result.status = "done"
+            result.error = None
+            break
+
+        result.error = process.stderr.strip() or f"exited with {process.returncode}"
+
+    result.duration = time.monotonic() - start
+    return result
+
+
+def export_scad(input_paths, export_format="stl", command=DEFAULT_COMMAND, workers=None, timeout=None, retries=0, force=False, progress=None):
+    """
+    Convert rendered .scad files with an external command, by default
+    OpenSCAD, writing each output next to its input with the export format
+    as extension. Up to workers commands run at once.
+
+    The command is a list of arguments, where {input}, {output} and {format}
+    are filled in for each job. Jobs which fail or take longer than timeout
+    seconds are retried up to retries times. Unless force is set, jobs whose
+    input, command and format are unchanged since the output was last
+    written are skipped, based on a manifest of content hashes kept beside
+    the outputs.
+
+    progress, if given, is called with each ExportResult, the number of jobs
+    finished so far and the total number of jobs as they complete. Returns
+    the results in the same order as input_paths.
+    """
+    input_paths = [os.fspath(p) for p in input_paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    manifests = {}
+    results = [None] * len(input_paths)
+    pending = {}
+
+    for i, input_path in enumerate(input_paths):
+        output_path = _output_path(input_path, export_format)
+        manifest_path = _manifest_path(output_path)
+        if manifest_path not in manifests:
+            manifests[manifest_path] = _read_manifest(manifest_path)
+
+        job_hash = _job_hash(input_path, command, export_format)
+        manifest = manifests[manifest_path]
+        key = os.path.basename(output_path)
+        if not force and manifest.get(key) == job_hash and os.path.exists(output_path):
+            results[i] = ExportResult(input_path, output_path, "skipped")
+        else:
+            pending[i] = (output_path, manifest_path, key, job_hash)
+
+    finished = 0
+    for result in results:
+        if result is not None:
+            finished += 1
+            if progress is not None:
+                progress(result, finished, len(input_paths))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _run_job,
+                input_paths[i],
+                output_path,
+                command,
+                export_format,
+                timeout,
+                retries,
+            ): i
+            for i, (output_path, _, _, _) in pending.items()
+        }
+
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = result = future.result()
+            _, manifest_path, key, job_hash = pending[i]
+
+            if result.status == "done":
+                manifests[manifest_path][key] = job_hash
+            else:
+                manifests[manifest_path].pop(key, None)
+
+            finished += 1
+            if progress is not None:
+                progress(result, finished, len(input_paths))
+
+    for manifest_path, manifest in manifests.items():
+        _write_manifest(manifest_path, manifest)
+
+    return results
@@ -0,0 +1,590 @@
+import contextlib
+import copy
+import dataclasses
+import gc
+from dataclasses import dataclass
+import weakref
+
+import numpy as np
+import solid
+
+import solid_state.bounds
+import solid_state.lookup
+import solid_state.query
+
+
+# Instance attributes every OpenSCADObject has, along with their defaults.
+# Anything else found on an object (or a non-default value for one of these)
+# is kept in the sparse extras table so thaw can restore it.
+_STRUCTURAL_ATTRS = {"name", "params", "children", "parent", "traits"}
+_DEFAULT_ATTRS = dict(
+    modifier="",
+    is_hole=False,
+    has_hole_children=False,
+    is_part_root=False,
+)
+_MISSING = object()
+
+_sibling_ranks = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True, eq=False)
+class FrozenScene:
+    """
+    Immutable, array-backed copy of an OpenSCADObject tree. Objects are
+    stored in depth-first (pre-order) order, so the subtree of object i is
+    the contiguous range i to end[i]. Object names, solid_state names and
+    object classes are interned, with -1 meaning no solid_state name.
+    Scenes compare by identity, so derived data such as bounds can be
+    cached per scene.
+    """
+
+    parent: np.ndarray
+    first_child: np.ndarray
+    next_sibling: np.ndarray
+    end: np.ndarray
+    depth: np.ndarray
+    obj_names: np.ndarray
+    state_names: np.ndarray
+    classes: np.ndarray
+    obj_name_table: tuple
+    state_name_table: tuple
+    class_table: tuple
+    params: tuple
+    attributes: dict
+    traits: dict
+    extras: dict
+
+    def __len__(self):
+        return len(self.parent)
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # None of the many objects created while building a scene or tree are
+    # garbage yet, so collecting in the middle of it is wasted time
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+_ATOMIC_TYPES = {int, float, str, bool, type(None)}
+
+
+def _copy_value(value):
+    if type(value) in _ATOMIC_TYPES:
+        return value
+
+    # vectors are by far the most common, and much quicker to copy directly
+    if type(value) is list:
+        return [v if type(v) in _ATOMIC_TYPES else _copy_value(v) for v in value]
+
+    return copy.deepcopy(value)
+
+
+def _copy_dict(values):
+    """
+    Copy of params or attributes, so a scene never shares mutable values,
+    ex. vectors, with an OpenSCADObject tree.
+    """
+    if values is None:
+        return None
+
+    return {k: _copy_value(v) for k, v in values.items()}
+
+
+def _readonly(values, dtype):
+    array = np.asarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def _intern(table, value):
+    if value not in table:
+        table[value] = len(table)
+
+    return table[value]
+
+
+def _build(parent, end, depth, obj_names, state_names, classes, **tables):
+    """
+    Assemble a FrozenScene, deriving the sibling links from the pre-order
+    parent and end arrays.
+    """
+    parent = np.asarray(parent, dtype=np.int32)
+    end = np.asarray(end, dtype=np.int32)
+    size = len(parent)
+    index = np.arange(size, dtype=np.int32)
+
+    first_child = np.full(size, -1, dtype=np.int32)
+    has_child = end > index + 1
+    first_child[has_child] = index[has_child] + 1
+
+    next_sibling = np.full(size, -1, dtype=np.int32)
+    following = np.minimum(end, size - 1)
+    has_sibling = (end < size) & (parent[following] == parent)
+    next_sibling[has_sibling] = end[has_sibling]
+
+    return FrozenScene(
+        parent=_readonly(parent, np.int32),
+        first_child=_readonly(first_child, np.int32),
+        next_sibling=_readonly(next_sibling, np.int32),
+        end=_readonly(end, np.int32),
+        depth=_readonly(depth, np.int32),
+        obj_names=_readonly(obj_names, np.int32),
+        state_names=_readonly(state_names, np.int32),
+        classes=_readonly(classes, np.int16),
+        **tables,
+    )
+
+
+def freeze(scad_obj):
+    """
+    Convert an OpenSCADObject tree into a FrozenScene.
+    """
+    obj_name_table = {}
+    state_name_table = {}
+    class_table = {}
+
+    parent = []
+    end = []
+    depth = []
+    obj_names = []
+    state_names = []
+    classes = []
+    params = []
+    attributes = {}
+    traits = {}
+    extras = {}
+
+    # Children are pushed in reverse so they are popped in order. A None
+    # marker closes the subtree of the object pushed before it.
+    stack = [(scad_obj, -1, 0)]
+    while stack:
+        item = stack.pop()
+        if item[0] is None:
+            end[item[1]] = len(parent)
+            continue
+
+        obj, parent_index, obj_depth = item
+        index = len(parent)
+
+        parent.append(parent_index)
+        end.append(index + 1)
+        depth.append(obj_depth)
+        obj_names.append(_intern(obj_name_table, obj.name))
+        classes.append(_intern(class_table, type(obj)))
+        params.append(_copy_dict(obj.params))
+
+        other_traits = dict(obj.traits)
+        if state := other_traits.pop("solid_state", None):
+            state_names.append(_intern(state_name_table, state["name"]))
+            attributes[index] = _copy_dict(state.get("attributes"))
+        else:
+            state_names.append(-1)
+
+        if other_traits:
+            traits[index] = other_traits
+
+        extra = {
+            k: v
+            for k, v in vars(obj).items()
+            if k not in _STRUCTURAL_ATTRS and _DEFAULT_ATTRS.get(k, _MISSING) != v
+        }
+        if extra:
+            extras[index] = extra
+
+        stack.append((None, index))
+        for child in reversed(obj.children):
+            stack.append((child, index, obj_depth + 1))
+
+    return _build(
+        parent,
+        end,
+        depth,
+        obj_names,
+        state_names,
+        classes,
+        obj_name_table=tuple(obj_name_table),
+        state_name_table=tuple(state_name_table),
+        class_table=tuple(class_table),
+        params=tuple(params),
+        attributes=attributes,
+        traits=traits,
+        extras=extras,
+    )
+
+
+def thaw(scene, index=0):
+    """
+    Convert a FrozenScene, or the subtree of a single object within it, back
+    into an OpenSCADObject tree.
+    """
+    # Objects are created without calling __init__, and linked to their
+    # parents directly, since this is the slow part of moving scenes
+    # between processes
+    end = int(scene.end[index])
+    parents = (scene.parent[index + 1:end] - index).tolist()
+    rows = zip(
+        range(index, end),
+        scene.classes[index:end].tolist(),
+        scene.obj_names[index:end].tolist(),
+        scene.state_names[index:end].tolist(),
+    )
+
+    objects = []
+    with _gc_paused():
+        for i, class_id, name_id, state_id in rows:
+            cls = scene.class_table[class_id]
+            obj = cls.__new__(cls)
+
+            traits = dict(scene.traits.get(i, {}))
+            if state_id != -1:
+                traits["solid_state"] = dict(
+                    name=scene.state_name_table[state_id],
+                    attributes=_copy_dict(scene.attributes[i]),
+                )
+
+            vars(obj).update(
+                name=scene.obj_name_table[name_id],
+                params=_copy_dict(scene.params[i]),
+                children=[],
+                parent=None,
+                traits=traits,
+                **_DEFAULT_ATTRS,
+            )
+            if (extra := scene.extras.get(i)) is not None:
+                vars(obj).update(extra)
+
+            objects.append(obj)
+
+    for obj, parent in zip(objects[1:], parents):
+        obj.parent = objects[parent]
+        obj.parent.children.append(obj)
+
+    return objects[0]
+
+
+def get_name(scene, index=0):
+    if (state_id := scene.state_names[index]) != -1:
+        return scene.state_name_table[state_id]
+
+    return None
+
+
+def _covered(scene, indices, inclusive=False):
+    """
+    Mask of all objects which are descendants of any of the given objects.
+    """
+    size = len(scene)
+    starts = indices if inclusive else indices + 1
+    counts = np.bincount(starts, minlength=size + 1)
+    counts -= np.bincount(scene.end[indices], minlength=size + 1)
+    return np.cumsum(counts[:size]) > 0
+
+
+def _term_mask(scene, term):
+    mask = np.ones(len(scene), dtype=bool)
+
+    if term.obj_name is not None:
+        try:
+            obj_id = scene.obj_name_table.index(term.obj_name)
+        except ValueError:
+            return np.zeros(len(scene), dtype=bool)
+        mask &= scene.obj_names == obj_id
+
+    if term.state_name is not None:
+        try:
+            state_id = scene.state_name_table.index(term.state_name)
+        except ValueError:
+            return np.zeros(len(scene), dtype=bool)
+        mask &= scene.state_names == state_id
+
+    for negation in term.negations:
+        mask &= ~_term_mask(scene, negation)
+
+    if term.within is not None:
+        mask &= solid_state.bounds.within_mask(scene, term.within)
+
+    return mask
+
+
+def _path_mask(scene, query_path):
+    # reachable holds the objects with every term so far matched, in order,
+    # by some chain of their ancestors
+    reachable = np.ones(len(scene), dtype=bool)
+    for term in query_path.terms[:-1]:
+        matched = np.flatnonzero(reachable & _term_mask(scene, term))
+        reachable = _covered(scene, matched)
+
+    return reachable & _term_mask(scene, query_path.terms[-1])
+
+
+def _excluded_mask(scene, exclude):
+    excluded = np.zeros(len(scene), dtype=bool)
+    if exclude is None:
+        return excluded
+
+    for query_path in solid_state.query.parse(exclude).paths:
+        excluded |= _path_mask(scene, query_path)
+
+    return _covered(scene, np.flatnonzero(excluded), inclusive=True)
+
+
+def get_indices(scene, query, exclude=None):
+    """
+    Get the indices of all objects matching the query, in the same order
+    as lookup.get_objects.
+    """
+    excluded = _excluded_mask(scene, exclude)
+
+    results = []
+    for query_path in solid_state.query.parse(query).paths:
+        results.append(np.flatnonzero(_path_mask(scene, query_path) & ~excluded))
+
+    return np.concatenate(results)
+
+
+def get_ancestors(scene, index):
+    """
+    Get the indices of all ancestors of an object, starting from the root.
+    """
+    ancestors = []
+    while (index := scene.parent[index]) != -1:
+        ancestors.append(index)
+
+    return ancestors[::-1]
+
+
+def _get_sibling_ranks(scene):
+    """
+    Position of each object among the children of its parent, cached for as
+    long as the scene exists.
+    """
+    if (ranks := _sibling_ranks.get(scene)) is not None:
+        return ranks
+
+    # a stable sort by parent keeps siblings in order
+    order = np.argsort(scene.parent, kind="stable")
+    sorted_parents = scene.parent[order]
+    ranks = np.empty(len(scene), dtype=np.int32)
+    ranks[order] = np.arange(len(scene)) - np.searchsorted(sorted_parents, sorted_parents)
+    ranks.setflags(write=False)
+
+    _sibling_ranks[scene] = ranks
+    return ranks
+
+
+def get_path(scene, index):
+    """
+    Get the position of an object in an OpenSCADObject tree, as the index
+    of each child taken from the root, like the paths used by lookup.
+    """
+    ranks = _get_sibling_ranks(scene)
+    path = []
+    while scene.parent[index] != -1:
+        path.append(int(ranks[index]))
+        index = scene.parent[index]
+
+    return tuple(path[::-1])
+
+
+def prune(scene, exclude):
+    """
+    Get a new FrozenScene with all subtrees matching the exclude query
+    removed. Returns None if the root itself is excluded.
+    """
+    excluded = _excluded_mask(scene, exclude)
+    if not excluded.any():
+        return scene
+
+    if excluded[0]:
+        return None
+
+    keep = np.flatnonzero(~excluded)
+
+    # position of each old index in the pruned scene
+    kept_before = np.concatenate(([0], np.cumsum(~excluded)))
+
+    parent = scene.parent[keep]
+    parent = np.where(parent == -1, -1, kept_before[parent])
+
+    def _subset(table):
+        return {
+            int(kept_before[i]): v for i, v in table.items() if not excluded[i]
+        }
+
+    return _build(
+        parent,
+        kept_before[scene.end[keep]],
+        scene.depth[keep],
+        scene.obj_names[keep],
+        scene.state_names[keep],
+        scene.classes[keep],
+        obj_name_table=scene.obj_name_table,
+        state_name_table=scene.state_name_table,
+        class_table=scene.class_table,
+        params=tuple(scene.params[i] for i in keep),
+        attributes=_subset(scene.attributes),
+        traits=_subset(scene.traits),
+        extras=_subset(scene.extras),
+    )
+
+
+def _merge_table(table, other):
+    """
+    Add the values of another interning table, returning the new table and
+    the ids of the other table's values in it.
+    """
+    table = dict(zip(table, range(len(table))))
+    ids = np.array([_intern(table, value) for value in other], dtype=np.int32)
+    return tuple(table), ids
+
+
+def _splice(scene, pieces):
+    """
+    Get a new FrozenScene with the subtree of each index in pieces swapped
+    for the given FrozenScene, or removed if it is None. The subtrees must
+    not overlap.
+    """
+    size = len(scene)
+    indices = np.array(sorted(pieces), dtype=np.int32)
+    new_sizes = np.array([0 if pieces[i] is None else len(pieces[i]) for i in indices])
+
+    # shift[k] is how far an object at index k moves
+    shift = np.zeros(size + 1, dtype=np.int64)
+    np.add.at(shift, scene.end[indices], new_sizes - (scene.end[indices] - indices))
+    shift = np.cumsum(shift)
+
+    kept = ~_covered(scene, indices, inclusive=True)
+    keep = np.flatnonzero(kept)
+    new_size = size + int(shift[size])
+
+    parent = np.empty(new_size, dtype=np.int32)
+    end = np.empty(new_size, dtype=np.int32)
+    depth = np.empty(new_size, dtype=np.int32)
+    obj_names = np.empty(new_size, dtype=np.int32)
+    state_names = np.empty(new_size, dtype=np.int32)
+    classes = np.empty(new_size, dtype=np.int16)
+    params = [None] * new_size
+
+    position = keep + shift[keep]
+    old_parent = scene.parent[keep]
+    parent[position] = np.where(old_parent == -1, -1, old_parent + shift[np.maximum(old_parent, 0)])
+    end[position] = scene.end[keep] + shift[scene.end[keep]]
+    depth[position] = scene.depth[keep]
+    obj_names[position] = scene.obj_names[keep]
+    state_names[position] = scene.state_names[keep]
+    classes[position] = scene.classes[keep]
+    for old, new in zip(keep, position):
+        params[new] = scene.params[old]
+
+    tables = dict(
+        obj_name_table=scene.obj_name_table,
+        state_name_table=scene.state_name_table,
+        class_table=scene.class_table,
+    )
+    sparse = {}
+    for name in ("attributes", "traits", "extras"):
+        sparse[name] = {
+            int(i + shift[i]): v for i, v in getattr(scene, name).items() if kept[i]
+        }
+
+    for index in indices:
+        piece = pieces[index]
+        if piece is None:
+            continue
+
+        start = index + shift[index]
+        stop = start + len(piece)
+        old_parent = scene.parent[index]
+        parent[start:stop] = piece.parent + start
+        parent[start] = -1 if old_parent == -1 else old_parent + shift[old_parent]
+        end[start:stop] = piece.end + start
+        depth[start:stop] = piece.depth + scene.depth[index]
+        params[start:stop] = piece.params
+
+        for name, column, target in (
+            ("obj_name_table", piece.obj_names, obj_names),
+            ("state_name_table", piece.state_names, state_names),
+            ("class_table", piece.classes, classes),
+        ):
+            tables[name], ids = _merge_table(tables[name], getattr(piece, name))
+            # the extra -1 at the end keeps -1 (no solid_state name) as is
+            target[start:stop] = np.append(ids, -1)[column]
+
+        for name in sparse:
+            sparse[name].update(
+                (int(start + i), v) for i, v in getattr(piece, name).items()
+            )
+
+    return _build(
+        parent,
+        end,
+        depth,
+        obj_names,
+        state_names,
+        classes,
+        params=tuple(params),
+        **tables,
+        **sparse,
+    )
+
+
+def _outermost(scene, indices):
+    return indices[~_covered(scene, indices)[indices]]
+
+
+def replace(scene, query, func, exclude=None):
+    """
+    Get a new FrozenScene with every object matching the query replaced by
+    the result of calling func with it as an OpenSCADObject, or removed if
+    func returns None. Matches inside other matches are replaced first, as
+    with lookup.replace. The arrays are rebuilt, but only the replaced
+    subtrees are thawed.
+    """
+    indices = get_indices(scene, query, exclude)
+    if len(indices) == 0:
+        return scene
+
+    pieces = {}
+    for index in _outermost(scene, np.unique(indices)):
+        nested = indices[(indices >= index) & (indices < scene.end[index])]
+        depth = len(get_path(scene, index))
+        paths = [get_path(scene, i)[depth:] for i in nested]
+        new_obj = solid_state.lookup._edit_paths(thaw(scene, index), paths, func)
+        pieces[int(index)] = None if new_obj is None else freeze(new_obj)
+
+    if 0 in pieces and pieces[0] is None:
+        return None
+
+    return _splice(scene, pieces)
+
+
+def update_attributes(scene, query, **changes):
+    """
+    Get a new FrozenScene with the solid_state attributes of every object
+    matching the query updated. Everything but the attributes is shared
+    with the original scene, including its cached bounds.
+    """
+    indices = get_indices(scene, query)
+    if len(indices) == 0:
+        return scene
+
+    attributes = dict(scene.attributes)
+    for index in indices:
+        if scene.state_names[index] == -1:
+            name = scene.obj_name_table[scene.obj_names[index]]
+            raise Exception(f"Can't update attributes of '{name}', it has no solid_state name")
+
+        attributes[int(index)] = {**(attributes[index] or {}), **_copy_dict(changes)}
+
+    new_scene = dataclasses.replace(scene, attributes=attributes)
+    if (bounds := solid_state.bounds._scene_bounds.get(scene)) is not None:
+        solid_state.bounds._scene_bounds[new_scene] = bounds
+
+    return new_scene
@@ -1,50 +1,299 @@
+import copy
+import weakref
+
+import numpy as np
 import solid
 
+import solid_state.bounds
+import solid_state.frozen
 import solid_state.solid_state
 import solid_state.query
 
 
+# Frozen copies of trees used for spatial queries, kept for as long as the
+# root exists, along with the ids of the objects in the tree when it was
+# frozen
+_frozen_copies = weakref.WeakKeyDictionary()
+
+_transformation_lookup = dict(
+    color=solid.color,
+    mirror=solid.mirror,
+    rotate=solid.rotate,
+    scale=solid.scale,
+    translate=solid.translate,
+)
+
+
+def _is_frozen(scad_obj):
+    return isinstance(scad_obj, solid_state.frozen.FrozenScene)
+
+
 def get_name(scad_obj):
     """
     Get the solid_state name of an object, if it has one.
     """
+    if _is_frozen(scad_obj):
+        return solid_state.frozen.get_name(scad_obj)
+
     if state := scad_obj.get_trait("solid_state"):
         return state["name"]
 
     return None
 
 
-def _get_object_paths(scad_obj, query_path, path = (), results = None):
+def _term_matches(term, obj_name, state_name):
+    if term.within is not None:
+        raise ValueError(":within() needs the geometry of the objects, which isn't known here")
+
+    if term.obj_name is not None and term.obj_name != obj_name:
+        return False
+
+    if term.state_name is not None and term.state_name != state_name:
+        return False
+
+    return not any(_term_matches(n, obj_name, state_name) for n in term.negations)
+
+
+def _advance_exclusions(obj_name, state_name, exclude_paths):
+    """
+    Step each exclusion path past the current object. Returns None if the
+    object itself is excluded, otherwise the exclusion paths that apply to
+    its children.
+    """
+    advanced = []
+    for exclude_path in exclude_paths:
+        if _term_matches(exclude_path.terms[0], obj_name, state_name):
+            if len(exclude_path.terms) == 1:
+                return None
+
+            exclude_path = solid_state.query.Path(terms=exclude_path.terms[1:])
+
+        advanced.append(exclude_path)
+
+    return advanced
+
+
+def _get_object_paths(scad_obj, query_path, path = (), results = None, exclude_paths = ()):
     if results is None:
         results = []
 
+    if exclude_paths:
+        exclude_paths = _advance_exclusions(scad_obj.name, get_name(scad_obj), exclude_paths)
+        if exclude_paths is None:
+            return results
+
     term = query_path.terms[0]
-    if(term.obj_name is None or term.obj_name == scad_obj.name):
-        if(term.state_name is None or term.state_name == get_name(scad_obj)):
-            if len(query_path.terms) == 1:
-                results.append(path)
+    if _term_matches(term, scad_obj.name, get_name(scad_obj)):
+        if len(query_path.terms) == 1:
+            results.append(path)
 
-            else:
-                query_path = solid_state.query.Path(terms=query_path.terms[1:])
+        else:
+            query_path = solid_state.query.Path(terms=query_path.terms[1:])
 
     for i, child in enumerate(scad_obj.children):
-        _get_object_paths(child, query_path, path + (i,), results)
+        _get_object_paths(child, query_path, path + (i,), results, exclude_paths)
 
     return results
 
 
-def _get_paths_for_query(scad_obj, query_string):
+def _get_exclude_paths(exclude):
+    if exclude is None:
+        return []
+
+    return solid_state.query.parse(exclude).paths
+
+
+def _is_spatial(query_paths):
+    return any(term.within is not None for path in query_paths for term in path.terms)
+
+
+def _object_ids(scad_obj):
+    ids = []
+    stack = [scad_obj]
+    while stack:
+        obj = stack.pop()
+        ids.append(id(obj))
+        stack.extend(obj.children)
+
+    return ids
+
+
+def _frozen_copy(scad_obj):
+    """
+    Get a frozen copy of a tree, so its bounds are only computed once for
+    any number of spatial queries. It is frozen again if objects were added
+    to or removed from the tree since, but not if their params were changed
+    in place.
+    """
+    ids = _object_ids(scad_obj)
+    cached = _frozen_copies.get(scad_obj)
+    if cached is not None and cached[0] == ids:
+        return cached[1]
+
+    scene = solid_state.frozen.freeze(scad_obj)
+    _frozen_copies[scad_obj] = (ids, scene)
+    return scene
+
+
+def _get_frozen_paths(scad_obj, query_string, exclude = None):
+    # spatial queries are answered using the bounds of a frozen copy
+    scene = _frozen_copy(scad_obj)
+    return [
+        solid_state.frozen.get_path(scene, i)
+        for i in solid_state.frozen.get_indices(scene, query_string, exclude)
+    ]
+
+
+def _get_paths_for_query(scad_obj, query_string, exclude = None):
     query = solid_state.query.parse(query_string)
+    exclude_paths = _get_exclude_paths(exclude)
+    if _is_spatial(query.paths) or _is_spatial(exclude_paths):
+        return _get_frozen_paths(scad_obj, query_string, exclude)
+
     paths = []
     for query_path in query.paths:
-        paths = [*paths, *_get_object_paths(scad_obj, query_path)]
+        paths = [*paths, *_get_object_paths(scad_obj, query_path, exclude_paths=exclude_paths)]
 
     return paths
 
 
+def _get_excluded_paths(scad_obj, exclude_paths, path = (), results = None):
+    if results is None:
+        results = []
+
+    exclude_paths = _advance_exclusions(scad_obj.name, get_name(scad_obj), exclude_paths)
+    if exclude_paths is None:
+        results.append(path)
+        return results
+
+    for i, child in enumerate(scad_obj.children):
+        _get_excluded_paths(child, exclude_paths, path + (i,), results)
+
+    return results
+
+
+def _copy_node(scad_obj, children):
+    """
+    Shallow copy of a single object with a new list of children. The
+    children themselves are shared with the original tree.
+    """
+    new_obj = copy.copy(scad_obj)
+    new_obj.children = children
+    new_obj.traits = dict(scad_obj.traits)
+    return new_obj
+
+
+def _edit_paths(scad_obj, paths, func):
+    """
+    Copy the objects along the paths, calling func on the objects at the
+    end of each path and using its result in their place, or dropping them
+    if it returns None. Matches inside other matches are edited first.
+    """
+    by_child = {}
+    for path in paths:
+        if path:
+            by_child.setdefault(path[0], []).append(path[1:])
+
+    if by_child:
+        children = []
+        for i, child in enumerate(scad_obj.children):
+            if i in by_child:
+                child = _edit_paths(child, by_child[i], func)
+                if child is None:
+                    continue
+
+            children.append(child)
+
+        scad_obj = _copy_node(scad_obj, children)
+
+    if () in paths:
+        return func(scad_obj)
+
+    return scad_obj
+
+
+def _remove_paths(scad_obj, paths):
+    return _edit_paths(scad_obj, paths, lambda _: None)
+
+
+def prune(scad_obj, exclude):
+    """
+    Get a copy of an object with all subtrees matching the exclude query
+    removed. Only the objects between the root and the removed subtrees are
+    copied, everything else is shared with the original. Returns None if the
+    root itself is excluded.
+    """
+    if _is_frozen(scad_obj):
+        return solid_state.frozen.prune(scad_obj, exclude)
+
+    exclude_paths = _get_exclude_paths(exclude)
+    if _is_spatial(exclude_paths):
+        scene = _frozen_copy(scad_obj)
+        excluded = solid_state.frozen._excluded_mask(scene, exclude)
+        # only the outermost excluded objects need removing
+        excluded[1:] &= ~excluded[scene.parent[1:]]
+        paths = [solid_state.frozen.get_path(scene, i) for i in np.flatnonzero(excluded)]
+    else:
+        paths = _get_excluded_paths(scad_obj, exclude_paths)
+
+    if not paths:
+        return scad_obj
+
+    return _remove_paths(scad_obj, paths)
+
+
+def replace(scad_obj, query, func, exclude = None):
+    """
+    Get a copy of an object with every object matching the query replaced
+    by the result of calling func with it, or removed if func returns None.
+    Only the objects between the root and the matches are copied, everything
+    else is shared with the original, so func should return a new object
+    rather than modifying the one it is given.
+    """
+    if _is_frozen(scad_obj):
+        return solid_state.frozen.replace(scad_obj, query, func, exclude)
+
+    paths = _get_paths_for_query(scad_obj, query, exclude)
+    if not paths:
+        return scad_obj
+
+    return _edit_paths(scad_obj, paths, func)
+
+
+def _with_attributes(scad_obj, changes):
+    state = scad_obj.get_trait("solid_state")
+    if state is None:
+        raise Exception(f"Can't update attributes of '{scad_obj.name}', it has no solid_state name")
+
+    new_obj = _copy_node(scad_obj, list(scad_obj.children))
+    new_obj.traits["solid_state"] = dict(
+        state,
+        attributes={**(state.get("attributes") or {}), **changes},
+    )
+    return new_obj
+
+
+def update_attributes(scad_obj, query, **changes):
+    """
+    Get a copy of an object with the solid_state attributes of every object
+    matching the query updated, sharing everything else with the original
+    like replace.
+    """
+    if _is_frozen(scad_obj):
+        return solid_state.frozen.update_attributes(scad_obj, query, **changes)
+
+    return replace(scad_obj, query, lambda obj: _with_attributes(obj, changes))
+
+
 # TODO raise exception for no matching objects? or at least a warning?
-def get_objects(scad_obj, query):
-    paths = _get_paths_for_query(scad_obj, query)
+def get_objects(scad_obj, query, exclude = None):
+    if _is_frozen(scad_obj):
+        return [
+            solid_state.frozen.thaw(scad_obj, i)
+            for i in solid_state.frozen.get_indices(scad_obj, query, exclude)
+        ]
+
+    paths = _get_paths_for_query(scad_obj, query, exclude)
 
     objects = []
     for path in paths:
@@ -57,12 +306,12 @@ def get_objects(scad_obj, query):
     return objects
 
 
-def get_object(scad_obj, query):
+def get_object(scad_obj, query, exclude = None):
     """
     Get a single object with a given solid_state name. Throws an exception
     if a single match is not found.
     """
-    objects = get_objects(scad_obj, query)
+    objects = get_objects(scad_obj, query, exclude)
 
     num_objects = len(objects)
     if num_objects != 1:
@@ -71,10 +320,37 @@ def get_object(scad_obj, query):
     return objects[0]
 
 
+def get_bounds(scad_obj, query = None, exclude = None):
+    """
+    Get the axis aligned bounds of an object, or of all objects matching the
+    query, as arrays of the lowest and highest corner. With a query the
+    result has shape (N, 2, 3), in the same order as get_objects, otherwise
+    (2, 3). Objects without geometry have NaN bounds, and objects whose size
+    isn't known, ex. imported files, have infinite bounds.
+    """
+    scene = scad_obj if _is_frozen(scad_obj) else _frozen_copy(scad_obj)
+    bounds = solid_state.bounds.scene_bounds(scene)
+    if query is None:
+        return bounds[0]
+
+    return bounds[solid_state.frozen.get_indices(scene, query, exclude)]
+
+
 def get_attributes(scad_obj, query = None):
     """
     Get solid_state attributes of an object with the given name.
     """
+    if _is_frozen(scad_obj):
+        index = 0
+        if query is not None:
+            indices = solid_state.frozen.get_indices(scad_obj, query)
+            if len(indices) != 1:
+                raise Exception(f"{len(indices)} matches found for query '{query}' when 1 was expected")
+
+            index = indices[0]
+
+        return solid_state.frozen._copy_dict(scad_obj.attributes[index])
+
     if query is not None:
         scad_obj = get_object(scad_obj, query)
 
@@ -84,27 +360,22 @@ def get_attributes(scad_obj, query = None):
 # TODO
 # - DRY with get_objects
 # - return reusable transformation functions not the actual objects
-def get_transformations(scad_obj, query):
+def get_transformations(scad_obj, query, exclude = None):
     """
     Get all transformations that were made after the named state.
     """
-    paths = _get_paths_for_query(scad_obj, query)
+    if _is_frozen(scad_obj):
+        return _get_frozen_transformations(scad_obj, query, exclude)
 
-    transformation_lookup = dict(
-        color=solid.color,
-        mirror=solid.mirror,
-        rotate=solid.rotate,
-        scale=solid.scale,
-        translate=solid.translate,
-    )
+    paths = _get_paths_for_query(scad_obj, query, exclude)
 
     results = []
     for path in paths:
         tmp_obj = scad_obj
         transformations = []
         for step in path:
-            if tmp_obj.name in transformation_lookup:
-                func = transformation_lookup[tmp_obj.name](**tmp_obj.params)
+            if tmp_obj.name in _transformation_lookup:
+                func = _transformation_lookup[tmp_obj.name](**tmp_obj.params)
                 transformations = [func, *transformations]
 
             tmp_obj = tmp_obj.children[step]
@@ -114,6 +385,21 @@ def get_transformations(scad_obj, query):
     return results
 
 
+def _get_frozen_transformations(scene, query, exclude = None):
+    results = []
+    for index in solid_state.frozen.get_indices(scene, query, exclude):
+        transformations = []
+        for ancestor in solid_state.frozen.get_ancestors(scene, index):
+            name = scene.obj_name_table[scene.obj_names[ancestor]]
+            if name in _transformation_lookup:
+                func = _transformation_lookup[name](**scene.params[ancestor])
+                transformations = [func, *transformations]
+
+        results.append(transformations)
+
+    return results
+
+
 def transform_like(scad_obj, query):
     transformations = get_transformations(scad_obj, query)
     if len(transformations) != 1:
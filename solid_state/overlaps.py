@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+import solid_state.bounds as bounds
+import solid_state.frozen as frozen
+import solid_state.query
+
+
+@dataclass
+class Overlap:
+    # solid_state name of each object, or its object name if it has none,
+    # and its path as child indices from the root
+    first: str
+    first_path: tuple
+    second: str
+    second_path: tuple
+    # whether the size of either object isn't known, ex. an imported file,
+    # in which case it is assumed to overlap everything
+    unbounded: bool = False
+
+
+def _label(scene, index):
+    name = frozen.get_name(scene, index)
+    if name is None:
+        name = scene.obj_name_table[scene.obj_names[index]]
+
+    return name
+
+
+def _sweep(lo, hi):
+    """
+    Sweep and prune: get all pairs of boxes which overlap, as two arrays of
+    positions with the first always lower. Boxes which only touch don't
+    overlap, except on axes where either box is flat, ex. 2D objects in the
+    z=0 plane, which overlap anything they touch.
+    """
+    # sweep along the axis the bounded boxes are most spread out on
+    with np.errstate(invalid="ignore"):
+        centers = lo + hi
+    centers = centers[np.isfinite(centers).all(axis=1)]
+    axis = np.argmax(np.ptp(centers, axis=0)) if len(centers) else 0
+    order = np.argsort(lo[:, axis], kind="stable")
+    starts = lo[order, axis]
+
+    # every box starting before (or where) the current one ends is a
+    # candidate on the axis
+    stop = np.searchsorted(starts, hi[order, axis], side="right")
+    position = np.arange(len(order))
+    counts = np.maximum(stop - position - 1, 0)
+
+    first = np.repeat(position, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = first + 1 + offsets
+
+    first = order[first]
+    second = order[second]
+    flat = (lo[first] == hi[first]) | (lo[second] == hi[second])
+    apart = (lo[first] > hi[second]) | (lo[second] > hi[first])
+    touching = (lo[first] == hi[second]) | (lo[second] == hi[first])
+    keep = (~apart & (flat | ~touching)).all(axis=1)
+
+    first = first[keep]
+    second = second[keep]
+    return np.minimum(first, second), np.maximum(first, second)
+
+
+def find_overlaps(scad_obj, query, exclude=None):
+    """
+    Find pairs of objects whose bounds overlap. Each comma separated part of
+    the query is a group, and pairs are made of objects from different
+    groups, or from within the group if there is only one. Objects never
+    overlap their own descendants.
+
+    Only bounds are compared, so these are candidates which may not actually
+    collide, but objects whose bounds don't overlap never do. Objects whose
+    size isn't known are candidates for overlapping every other object, and
+    are flagged as unbounded. Objects without any geometry never overlap.
+    """
+    scene = scad_obj if isinstance(scad_obj, frozen.FrozenScene) else frozen.freeze(scad_obj)
+    scene_bounds = bounds.scene_bounds(scene)
+    excluded = frozen._excluded_mask(scene, exclude)
+
+    groups = [
+        np.flatnonzero(frozen._path_mask(scene, query_path) & ~excluded)
+        for query_path in solid_state.query.parse(query).paths
+    ]
+    indices = np.concatenate(groups)
+    group_ids = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+
+    # objects without geometry, unlike unbounded ones, can't overlap
+    has_bounds = ~np.isnan(scene_bounds[indices]).any(axis=(1, 2))
+    indices = indices[has_bounds]
+    group_ids = group_ids[has_bounds]
+    if len(indices) < 2:
+        return []
+
+    first, second = _sweep(scene_bounds[indices, 0], scene_bounds[indices, 1])
+    if len(groups) > 1:
+        keep = group_ids[first] != group_ids[second]
+        first = first[keep]
+        second = second[keep]
+
+    pairs = np.stack((indices[first], indices[second]), axis=1)
+    pairs.sort(axis=1)
+    pairs = np.unique(pairs, axis=0)
+
+    # objects in several groups, and objects containing one another
+    a, b = pairs[:, 0], pairs[:, 1]
+    pairs = pairs[(a != b) & (b >= scene.end[a])]
+
+    paths = {}
+    for index in np.unique(pairs):
+        paths[index] = frozen.get_path(scene, index)
+
+    unbounded = np.isinf(scene_bounds).any(axis=(1, 2))
+    return [
+        Overlap(_label(scene, a), paths[a], _label(scene, b), paths[b], bool(unbounded[a] or unbounded[b]))
+        for a, b in pairs
+    ]
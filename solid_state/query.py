@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 import parsimonious
@@ -12,8 +12,15 @@ grammar = parsimonious.Grammar(
     r"""
         query = path+
         path = (term+) path_separator?
-        term = (term_pair / obj_name / state_name) term_separator?
-
+        term = (compound / pseudo_class+) term_separator?
+
+        compound = simple pseudo_class*
+        simple = term_pair / obj_name / state_name
+        pseudo_class = negation / within
+        negation = ":not(" simple (path_separator simple)* ")"
+        within = ":within(" number (coord_separator number)* ")"
+        number = ~"-?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][-+]?[0-9]+)?"
+        coord_separator = " "* "," " "*
         term_pair = obj_name state_name
         state_name = state_indicator name
         obj_name = ~"[A-Za-z0-9_-]+"
@@ -29,6 +36,9 @@ grammar = parsimonious.Grammar(
 class Term:
     obj_name: Optional[str] = None
     state_name: Optional[str] = None
+    negations: list["Term"] = field(default_factory=list)
+    # bounding box as (x0, y0, z0, x1, y1, z1)
+    within: Optional[tuple] = None
 
 
 @dataclass
@@ -41,6 +51,26 @@ class Query:
     paths: list[Path]
 
 
+def _merge_pseudo_classes(selector, pseudo_classes):
+    selector = dict(selector)
+    for pseudo_class in pseudo_classes:
+        if "negations" in pseudo_class:
+            selector["negations"] = [
+                *selector.get("negations", []),
+                *pseudo_class["negations"],
+            ]
+
+        if "within" in pseudo_class:
+            box = pseudo_class["within"]
+            if (previous := selector.get("within")) is not None:
+                # several :within() must all hold, so use their overlap
+                box = (*map(max, previous[:3], box[:3]), *map(min, previous[3:], box[3:]))
+
+            selector["within"] = box
+
+    return selector
+
+
 class Visitor(parsimonious.NodeVisitor):
     def visit_query(self, node, visited_children):
         return Query(visited_children)
@@ -49,7 +79,49 @@ class Visitor(parsimonious.NodeVisitor):
         return Path(visited_children[0])
 
     def visit_term(self, node, visited_children):
-        return Term(**visited_children[0][0])
+        selector = visited_children[0][0]
+        if isinstance(selector, list):
+            # bare pseudo classes, ex. ":not(.foo)"
+            selector = _merge_pseudo_classes({}, selector)
+
+        return Term(**selector)
+
+    def visit_compound(self, node, visited_children):
+        simple, pseudo_classes = visited_children
+        if isinstance(pseudo_classes, list):
+            simple = _merge_pseudo_classes(simple, pseudo_classes)
+
+        return simple
+
+    def visit_simple(self, node, visited_children):
+        return visited_children[0]
+
+    def visit_pseudo_class(self, node, visited_children):
+        return visited_children[0]
+
+    def visit_negation(self, node, visited_children):
+        _, first, rest, _ = visited_children
+        terms = [Term(**first)]
+        if isinstance(rest, list):
+            terms += [Term(**simple) for _, simple in rest]
+
+        return dict(negations=terms)
+
+    def visit_within(self, node, visited_children):
+        _, first, rest, _ = visited_children
+        coords = [first]
+        if isinstance(rest, list):
+            coords += [number for _, number in rest]
+
+        if len(coords) != 6:
+            raise ValueError(
+                f"Expected 6 coordinates x0,y0,z0,x1,y1,z1 in '{node.text}', got {len(coords)}"
+            )
+
+        return dict(within=tuple(coords))
+
+    def visit_number(self, node, visited_children):
+        return float(node.text)
 
     def visit_term_pair(self, node, visited_children):
         return {**visited_children[0], **visited_children[1]}
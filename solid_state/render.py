@@ -1,27 +1,174 @@
+import datetime
 import importlib
+import json
 
 import solid
+from solid.solidpython import indent, non_rendered_classes
 
 import solid_state.colors as colors
+import solid_state.compiler as compiler
+import solid_state.frozen as frozen
 import solid_state.lookup as lookup
 import solid_state.solid_state as solid_state
 
 
-def render_scad(scad_obj, file_path, selector=None, transform=True, colorize=True, color_scheme="solid_state.colors:default"):
+ANNOTATION_PREFIX = "/* solid_state "
+
+
+class _PrerenderedObject(solid.OpenSCADObject):
     """
-    Render all objects with matching solid_state names to file.
+    Root object for scad_render_to_file which renders as the given text, so
+    files get the same header, includes and footer as any other render.
+    """
+
+    def __init__(self, scad_obj, text):
+        super().__init__("prerendered", {})
+        self.children = [scad_obj]
+        self.text = text
+
+    def _render(self, render_holes=False):
+        return self.text
+
+
+def _annotation(state):
+    """
+    Comment placed before an object with solid_state metadata, which
+    solid_state.scad_reader uses to find named objects in rendered files.
+    """
+    data = json.dumps(
+        dict(name=state["name"], attributes=state.get("attributes")),
+        default=repr,
+    )
+    return ANNOTATION_PREFIX + data.replace("*/", "*\\/") + " */"
+
+
+def _use_modules(scad_obj, modules):
+    # cached code can call modules, which still need defining
+    if scad_obj.get_trait("solid_state") and modules.call(scad_obj) is not None:
+        return
+
+    for child in scad_obj.children:
+        _use_modules(child, modules)
+
+
+def _render_object(scad_obj, annotate, cache=None, modules=None):
+    # Mirrors OpenSCADObject._render, without the hole handling
+    state = scad_obj.get_trait("solid_state")
+    if modules is not None and state and (call := modules.call(scad_obj)) is not None:
+        s = "\n" + call
+        if annotate:
+            s = "\n" + _annotation(state) + s
+
+        return s
+
+    if cache is not None and state:
+        key = f"{cache.fingerprint(scad_obj)}-{int(annotate)}"
+        if modules is not None:
+            key += f"-modules-{modules.key}"
+
+        if (s := cache.get(key)) is not None:
+            if modules is not None:
+                _use_modules(scad_obj, modules)
+            return s
+
+    s = ""
+    for child in scad_obj.children:
+        s += _render_object(child, annotate, cache, modules)
+
+    if scad_obj.name in non_rendered_classes:
+        pass
+    elif not scad_obj.children:
+        s = scad_obj._render_str_no_children() + ";"
+    else:
+        s = scad_obj._render_str_no_children() + " {" + indent(s) + "\n}"
+
+    if annotate and state:
+        s = "\n" + _annotation(state) + s
+
+    if cache is not None and state:
+        cache.set(key, s)
+
+    return s
+
+
+def _module_definitions(modules):
+    # Bodies can use other modules, so keep going until no new ones are
+    # used. They aren't annotated, since their attributes are expressions.
+    definitions = {}
+    while len(definitions) < len(modules.used):
+        for name, module in list(modules.used.items()):
+            if name not in definitions:
+                body = _render_object(module.body, False, None, modules)
+                params = ", ".join(module.params)
+                definitions[name] = f"\nmodule {name}({params}) {{{indent(body)}\n}}"
+
+    return "".join(definitions.values())
+
+
+def scad_text(scad_obj, annotate=False, cache=None, modules=False):
+    """
+    Render an object to SCAD code. With annotate, each object with a
+    solid_state name is preceded by a comment holding its name and
+    attributes. With a RenderCache, the code of unchanged objects with
+    solid_state names is reused from previous renders. With modules, objects
+    from functions decorated with state(name, as_module=True) are rendered
+    as calls to an OpenSCAD module, defined once at the start. Trees
+    containing holes are rendered by SolidPython, without annotations,
+    caching or modules, since holes are moved to the end of the file.
+    """
+    if (not annotate and cache is None and not modules) or scad_obj.find_hole_children():
+        return scad_obj._render()
+
+    if not modules:
+        return _render_object(scad_obj, annotate, cache)
+
+    used = compiler.Modules()
+    s = _render_object(scad_obj, annotate, cache, used)
+    return _module_definitions(used) + s
+
+
+def _split_groups(selector):
+    # commas inside :not(...) or :within(...) don't separate groups
+    groups = [""]
+    depth = 0
+    for char in selector:
+        if char == "," and depth == 0:
+            groups.append("")
+            continue
+
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+
+        groups[-1] += char
+
+    return [group.strip() for group in groups]
+
+
+def _combine(scad_obj, selector, exclude, transform, colorize, color_scheme, annotate, cache, modules):
+    """
+    Build the root object to render, from all objects matching the selector.
     """
     color_scheme_package, color_scheme_name = color_scheme.split(":")
     color_scheme_module = importlib.import_module(color_scheme_package)
     color_scheme = getattr(color_scheme_module, color_scheme_name)
 
+    if exclude is not None:
+        scad_obj = lookup.prune(scad_obj, exclude)
+        if scad_obj is None:
+            scad_obj = solid.cube([0, 0, 0])
+
+    if isinstance(scad_obj, frozen.FrozenScene):
+        scad_obj = frozen.thaw(scad_obj)
+
     if selector is None:
         combined = scad_obj
         if colorize is True:
             combined = solid.color(color_scheme[0])(combined)
 
     else:
-        groups = map(lambda x: x.strip(), selector.split(","))
+        groups = _split_groups(selector)
 
         # TODO support color schemes, also cycle to not overflow
 
@@ -46,4 +193,32 @@ def render_scad(scad_obj, file_path, selector=None, transform=True, colorize=Tru
             for obj in objects:
                 combined += obj
 
-    solid.scad_render_to_file(combined, file_path)
+    if annotate is True or cache is not None or modules is True:
+        combined = _PrerenderedObject(combined, scad_text(combined, annotate, cache, modules))
+
+    return combined
+
+
+def render_scad(scad_obj, file_path, selector=None, exclude=None, transform=True, colorize=True, color_scheme="solid_state.colors:default", annotate=False, cache=None, modules=False):
+    """
+    Render all objects with matching solid_state names to file, leaving out
+    any subtrees matching the exclude query. With annotate, solid_state names
+    and attributes are kept in the output as comments. With a RenderCache,
+    only objects which changed since a previous render are converted to SCAD
+    code again. With modules, objects from functions decorated with
+    state(name, as_module=True) are written as calls to OpenSCAD modules.
+    Returns the path of the written file.
+    """
+    combined = _combine(scad_obj, selector, exclude, transform, colorize, color_scheme, annotate, cache, modules)
+    return solid.scad_render_to_file(combined, file_path)
+
+
+def render_scad_text(scad_obj, selector=None, exclude=None, transform=True, colorize=True, color_scheme="solid_state.colors:default", annotate=False, cache=None, modules=False):
+    """
+    Same as render_scad, but return the SCAD code rather than writing it to
+    file. SolidPython's copy of the calling module's source is left out.
+    """
+    combined = _combine(scad_obj, selector, exclude, transform, colorize, color_scheme, annotate, cache, modules)
+    date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    header = f"// Generated by SolidPython {solid.solidpython._get_version()} on {date}\n"
+    return solid.scad_render(combined, header)
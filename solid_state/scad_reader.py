@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+import json
+import mmap
+import re
+from typing import Optional
+
+import solid_state.lookup as lookup
+import solid_state.query
+from solid_state.render import ANNOTATION_PREFIX
+
+
+_token = re.compile(
+    rb"""
+        (?P<annotation>%(prefix)s(?P<data>.*?)\ \*/)
+      | (?P<comment>/\*.*?\*/|//[^\n]*)
+      | (?P<string>"(?:\\.|[^"\\])*")
+      | module\s+(?P<module>[A-Za-z_$][A-Za-z0-9_$]*)\s*\(
+      | (?P<statement>[#%%*!]?(?P<name>[A-Za-z_$][A-Za-z0-9_$]*))\s*\(
+      | (?P<punct>[(){};])
+    """
+    % {b"prefix": re.escape(ANNOTATION_PREFIX.encode())},
+    re.DOTALL | re.VERBOSE,
+)
+
+
+@dataclass
+class ScadMatch:
+    obj_name: str
+    state_name: Optional[str]
+    attributes: Optional[dict]
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class _Frame:
+    obj_name: str
+    state_name: Optional[str]
+    attributes: Optional[dict]
+    start: int
+    query_paths: Optional[list]
+    exclude_paths: Optional[list]
+    matched: bool = False
+
+
+def _open_frame(parent, obj_name, annotation, start):
+    state_name = None
+    attributes = None
+    if annotation is not None:
+        state_name = annotation["name"]
+        attributes = annotation["attributes"]
+
+    frame = _Frame(obj_name, state_name, attributes, start, None, None)
+
+    # objects below a module definition or an excluded object are skipped
+    if parent.query_paths is None:
+        return frame
+
+    exclude_paths = parent.exclude_paths
+    if exclude_paths:
+        exclude_paths = lookup._advance_exclusions(obj_name, state_name, exclude_paths)
+        if exclude_paths is None:
+            return frame
+
+    query_paths = []
+    for query_path in parent.query_paths:
+        if lookup._term_matches(query_path.terms[0], obj_name, state_name):
+            if len(query_path.terms) == 1:
+                frame.matched = True
+
+            else:
+                query_path = solid_state.query.Path(terms=query_path.terms[1:])
+
+        query_paths.append(query_path)
+
+    frame.query_paths = query_paths
+    frame.exclude_paths = exclude_paths
+    return frame
+
+
+def _close_frame(frame, buffer, end):
+    return ScadMatch(
+        obj_name=frame.obj_name,
+        state_name=frame.state_name,
+        attributes=frame.attributes,
+        start=frame.start,
+        end=end,
+        text=buffer[frame.start:end].decode(),
+    )
+
+
+def scan_scad(file_path, query, exclude=None):
+    """
+    Find all objects matching the query in a .scad file, without loading the
+    file or building the tree of objects. solid_state names are only known
+    for files rendered with annotate=True. Matches are yielded as soon as
+    the end of the object is reached, so an object is yielded after any
+    matching objects inside of it.
+    """
+    root = _Frame(None, None, None, 0, solid_state.query.parse(query).paths, lookup._get_exclude_paths(exclude))
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        stack = [root]
+        pending = None
+        annotation = None
+        annotation_start = None
+        paren_depth = 0
+
+        for token in _token.finditer(buffer):
+            kind = token.lastgroup
+            if paren_depth > 0:
+                # skip over params, only tracking nesting
+                if token.group("punct") == b"(" or kind in ("module", "statement"):
+                    paren_depth += 1
+                elif token.group("punct") == b")":
+                    paren_depth -= 1
+
+                continue
+
+            if kind == "annotation":
+                annotation = json.loads(token.group("data"))
+                annotation_start = token.start()
+
+            elif kind in ("module", "statement"):
+                if kind == "module":
+                    pending = _Frame("module", None, None, token.start(), None, None)
+                else:
+                    start = token.start() if annotation is None else annotation_start
+                    pending = _open_frame(stack[-1], token.group("name").decode(), annotation, start)
+
+                annotation = None
+                paren_depth = 1
+
+            elif kind == "punct":
+                punct = token.group("punct")
+                if punct == b"(":
+                    paren_depth += 1
+
+                elif punct == b"{":
+                    if pending is None:
+                        # a bare block, which is transparent to queries
+                        parent = stack[-1]
+                        pending = _Frame(None, None, None, token.start(), parent.query_paths, parent.exclude_paths)
+
+                    stack.append(pending)
+                    pending = None
+
+                elif punct == b";" and pending is not None:
+                    if pending.matched:
+                        yield _close_frame(pending, buffer, token.end())
+                    pending = None
+
+                elif punct == b"}" and len(stack) > 1:
+                    frame = stack.pop()
+                    if frame.matched:
+                        yield _close_frame(frame, buffer, token.end())
+
+
+def get_scad_objects(file_path, query, exclude=None):
+    """
+    Get the SCAD code of all objects matching the query in a .scad file.
+    """
+    return [match.text for match in scan_scad(file_path, query, exclude)]
+
+
+def count_scad_objects(file_path, query, exclude=None):
+    """
+    Count all objects matching the query in a .scad file.
+    """
+    return sum(1 for _ in scan_scad(file_path, query, exclude))
@@ -0,0 +1,467 @@
+from collections.abc import Mapping, Sequence
+import importlib
+import json
+import mmap
+import pickle
+import struct
+
+import numpy as np
+import solid
+
+import solid_state.frozen as frozen
+
+
+MAGIC = b"SOLIDST3"
+
+# Param value kinds. Numbers and flat lists of numbers are packed into a
+# single float64 array, None and bools are stored as their kind alone, and
+# anything else is pickled individually. Mixed vectors keep which of their
+# values are ints in a separate mask, so they come back exactly as they
+# were.
+_INT = 0
+_FLOAT = 1
+_INT_VECTOR = 2
+_FLOAT_VECTOR = 3
+_OBJECT = 4
+_MIXED_VECTOR = 5
+_NONE = 6
+_FALSE = 7
+_TRUE = 8
+
+_VECTORS = [_INT_VECTOR, _FLOAT_VECTOR, _MIXED_VECTOR]
+_CONSTANTS = {_NONE: None, _FALSE: False, _TRUE: True}
+
+# Largest integer a float64 holds exactly.
+_MAX_PACKED_INT = 2 ** 53
+
+# The sibling links aren't stored, since they are quick to derive from
+# these when loading.
+_SCENE_ARRAYS = [
+    "parent",
+    "end",
+    "depth",
+    "obj_names",
+    "state_names",
+    "classes",
+]
+
+
+class _PackedRecords(Mapping):
+    """
+    Read-only mapping of integer keys to individually pickled values, which
+    are only unpickled when first accessed.
+    """
+
+    def __init__(self, keys, offsets, buffer):
+        self._keys = keys
+        self._offsets = offsets
+        self._buffer = buffer
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            i = np.searchsorted(self._keys, key)
+            if i == len(self._keys) or self._keys[i] != key:
+                raise KeyError(key)
+
+            start, end = self._offsets[i], self._offsets[i + 1]
+            self._cache[key] = pickle.loads(self._buffer[start:end])
+
+        return self._cache[key]
+
+    def __iter__(self):
+        return (int(k) for k in self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def _cumulative_starts(sizes):
+    sizes = np.asarray(sizes, dtype=np.int64)
+    return np.cumsum(sizes) - sizes
+
+
+class _ParamLayout:
+    """
+    Where the values of each packed param are, derived from the kinds and
+    vector lengths since only those are stored.
+    """
+
+    def __init__(self, arrays):
+        self.keys = arrays["param_keys"]
+        self.kinds = arrays["param_kinds"]
+        self.offsets = np.concatenate(([0], np.cumsum(arrays["param_counts"], dtype=np.int64)))
+
+        is_vector = np.isin(self.kinds, _VECTORS)
+        self.vectors = np.flatnonzero(is_vector)
+        self.lengths = arrays["param_lengths"]
+
+        sizes = np.isin(self.kinds, [_INT, _FLOAT]).astype(np.int64)
+        sizes[is_vector] = self.lengths
+        self.number_starts = _cumulative_starts(sizes)
+
+        # masks are only stored for mixed vectors
+        self.mask_starts = np.zeros(len(self.kinds), dtype=np.int64)
+        mixed = self.kinds == _MIXED_VECTOR
+        self.mask_starts[mixed] = _cumulative_starts(self.lengths[self.kinds[self.vectors] == _MIXED_VECTOR])
+
+        self.object_starts = _cumulative_starts(self.kinds == _OBJECT)
+
+
+class _PackedParams(Sequence):
+    """
+    Read-only sequence of object params, decoded when first accessed.
+    """
+
+    def __init__(self, arrays, key_table, objects):
+        self._layout = _ParamLayout(arrays)
+        self._numbers = arrays["param_numbers"]
+        self._int_mask = arrays["param_int_mask"]
+        self._key_table = key_table
+        self._objects = objects
+
+    def _decode(self, entry):
+        layout = self._layout
+        kind = layout.kinds[entry]
+
+        if kind in _CONSTANTS:
+            return _CONSTANTS[kind]
+
+        if kind == _OBJECT:
+            return self._objects[int(layout.object_starts[entry])]
+
+        start = layout.number_starts[entry]
+        if kind == _INT:
+            return int(self._numbers[start])
+
+        if kind == _FLOAT:
+            return float(self._numbers[start])
+
+        length = layout.lengths[np.searchsorted(layout.vectors, entry)]
+        values = self._numbers[start:start + length]
+        if kind == _INT_VECTOR:
+            return [int(v) for v in values]
+
+        if kind == _MIXED_VECTOR:
+            mask_start = layout.mask_starts[entry]
+            is_int = self._int_mask[mask_start:mask_start + length]
+            return [int(v) if i else float(v) for v, i in zip(values, is_int)]
+
+        return values.tolist()
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        offsets = self._layout.offsets
+        return {
+            self._key_table[self._layout.keys[entry]]: self._decode(entry)
+            for entry in range(offsets[index], offsets[index + 1])
+        }
+
+    def __len__(self):
+        return len(self._layout.offsets) - 1
+
+
+def _unpack_vectors(layout, numbers, int_mask, values):
+    # vectors of the same kind and length are converted together
+    kinds = layout.kinds[layout.vectors]
+    for kind in _VECTORS:
+        for length in np.unique(layout.lengths[kinds == kind]):
+            group = (kinds == kind) & (layout.lengths == length)
+            entries = layout.vectors[group]
+            positions = layout.number_starts[entries, None] + np.arange(length)
+            vectors = numbers[positions]
+
+            if kind == _INT_VECTOR:
+                vectors = vectors.astype(np.int64)
+            elif kind == _MIXED_VECTOR:
+                is_int = int_mask[layout.mask_starts[entries, None] + np.arange(length)].astype(bool)
+                vectors = vectors.astype(object)
+                vectors[is_int] = vectors[is_int].astype(np.int64)
+
+            for entry, vector in zip(entries.tolist(), vectors.tolist()):
+                values[entry] = vector
+
+
+def _unpack_params(arrays, key_table, objects):
+    """
+    Decode the params of every object at once, which is much faster than
+    decoding them one by one through _PackedParams.
+    """
+    layout = _ParamLayout(arrays)
+    kinds = layout.kinds
+    numbers = arrays["param_numbers"]
+
+    values = np.empty(len(kinds), dtype=object)
+    for kind, value in _CONSTANTS.items():
+        values[kinds == kind] = value
+
+    ints = kinds == _INT
+    values[ints] = numbers[layout.number_starts[ints]].astype(np.int64).astype(object)
+    floats = kinds == _FLOAT
+    values[floats] = numbers[layout.number_starts[floats]].astype(object)
+
+    for entry in np.flatnonzero(kinds == _OBJECT).tolist():
+        values[entry] = objects[int(layout.object_starts[entry])]
+
+    _unpack_vectors(layout, numbers, arrays["param_int_mask"], values)
+
+    # Objects with the same keys, ex. all cylinders, are built together from
+    # a table with a row of values for each object. Scenes only have a few
+    # different sets of keys, so each pass takes all objects with the keys
+    # of the first one left.
+    counts = np.asarray(arrays["param_counts"], dtype=np.int64)
+    params = np.empty(len(counts), dtype=object)
+    params[counts == 0] = [{} for _ in range(np.count_nonzero(counts == 0))]
+    for count in np.unique(counts[counts > 0]):
+        objs = np.flatnonzero(counts == count)
+        entries = layout.offsets[objs, None] + np.arange(count)
+        keys = layout.keys[entries]
+
+        while len(objs):
+            group = (keys == keys[0]).all(axis=1)
+            # filling in a key at a time is much faster than dict(zip(...))
+            # for each object
+            names = [key_table[k] for k in keys[0].tolist()]
+            columns = [values[column].tolist() for column in entries[group].T]
+            dicts = [{names[0]: v} for v in columns[0]]
+            for name, column in zip(names[1:], columns[1:]):
+                for d, v in zip(dicts, column):
+                    d[name] = v
+
+            params[objs[group]] = dicts
+
+            objs = objs[~group]
+            entries = entries[~group]
+            keys = keys[~group]
+
+    return tuple(params.tolist())
+
+
+def _is_number(value):
+    # Subclasses, ex. numpy scalars, render differently so are pickled
+    if type(value) is int:
+        return abs(value) < _MAX_PACKED_INT
+
+    return type(value) is float
+
+
+def _smallest(values):
+    # smallest unsigned type which holds all the values
+    return np.asarray(values, dtype=np.min_scalar_type(np.max(values, initial=0)))
+
+
+def _pack_params(params):
+    key_table = {}
+    counts = []
+    keys = []
+    kinds = []
+    lengths = []
+    values = []
+    int_mask = []
+    objects = []
+
+    for obj_params in params:
+        counts.append(len(obj_params))
+        for k, v in obj_params.items():
+            keys.append(frozen._intern(key_table, k))
+
+            if v is None:
+                kinds.append(_NONE)
+
+            elif type(v) is bool:
+                kinds.append(_TRUE if v else _FALSE)
+
+            elif _is_number(v):
+                kinds.append(_INT if type(v) is int else _FLOAT)
+                values.append(v)
+
+            elif type(v) is list and v and all(map(_is_number, v)):
+                is_int = [type(x) is int for x in v]
+                if all(is_int):
+                    kinds.append(_INT_VECTOR)
+                elif any(is_int):
+                    kinds.append(_MIXED_VECTOR)
+                    int_mask.extend(is_int)
+                else:
+                    kinds.append(_FLOAT_VECTOR)
+
+                lengths.append(len(v))
+                values.extend(v)
+
+            else:
+                kinds.append(_OBJECT)
+                objects.append(v)
+
+    arrays = dict(
+        param_counts=_smallest(counts),
+        param_keys=_smallest(keys),
+        param_kinds=np.asarray(kinds, dtype=np.uint8),
+        param_lengths=_smallest(lengths),
+        param_numbers=np.asarray(values, dtype=np.float64),
+        param_int_mask=np.asarray(int_mask, dtype=np.uint8),
+    )
+
+    return arrays, tuple(key_table), dict(enumerate(objects))
+
+
+def _pack_records(name, records):
+    keys = sorted(records)
+    blobs = [pickle.dumps(records[k], protocol=pickle.HIGHEST_PROTOCOL) for k in keys]
+
+    arrays = {
+        f"{name}_keys": _smallest(keys),
+        f"{name}_offsets": _smallest(np.cumsum([0, *map(len, blobs)], dtype=np.int64)),
+    }
+
+    return arrays, b"".join(blobs)
+
+
+def _unpack_records(keys, offsets, buffer):
+    offsets = offsets.tolist()
+    blobs = map(buffer.__getitem__, map(slice, offsets, offsets[1:]))
+    return dict(zip(keys.tolist(), map(pickle.loads, blobs)))
+
+
+def _class_path(cls):
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _import_class(path):
+    module_name, qualname = path.split(":")
+    try:
+        value = importlib.import_module(module_name)
+        for attr in qualname.split("."):
+            value = getattr(value, attr)
+
+    except (ImportError, AttributeError):
+        # Classes generated at runtime, such as those from solid.import_scad,
+        # can't always be found again. The base class renders the same
+        # name and params.
+        return solid.OpenSCADObject
+
+    return value
+
+
+def _align(n):
+    return (n + 7) // 8 * 8
+
+
+def dump_scene(scene, file_path):
+    """
+    Write a scene, either an OpenSCADObject or a FrozenScene, to file in a
+    compact binary format which can be read back with load_scene.
+    """
+    if not isinstance(scene, frozen.FrozenScene):
+        scene = frozen.freeze(scene)
+
+    arrays = {name: getattr(scene, name) for name in _SCENE_ARRAYS}
+
+    param_arrays, param_key_table, param_objects = _pack_params(scene.params)
+    arrays.update(param_arrays)
+
+    blobs = {}
+    for name, records in [
+        ("param_objects", param_objects),
+        ("attributes", scene.attributes),
+        ("traits", scene.traits),
+        ("extras", scene.extras),
+    ]:
+        record_arrays, blobs[name] = _pack_records(name, records)
+        arrays.update(record_arrays)
+
+    blobs["tables"] = json.dumps(
+        dict(
+            obj_name_table=scene.obj_name_table,
+            state_name_table=scene.state_name_table,
+            class_table=[_class_path(c) for c in scene.class_table],
+        )
+    ).encode()
+    blobs["param_key_table"] = pickle.dumps(param_key_table)
+
+    sections = []
+    offset = 0
+    header = dict(size=len(scene), arrays={}, blobs={})
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        header["arrays"][name] = [array.dtype.str, offset, len(array)]
+        sections.append((offset, array.tobytes()))
+        offset = _align(offset + array.nbytes)
+
+    for name, blob in blobs.items():
+        header["blobs"][name] = [offset, len(blob)]
+        sections.append((offset, blob))
+        offset = _align(offset + len(blob))
+
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(file_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for section_offset, data in sections:
+            f.seek(data_start + section_offset)
+            f.write(data)
+
+
+def load_scene(file_path, mmap_mode=False, lazy=False):
+    """
+    Read a FrozenScene written by dump_scene. With mmap_mode the file is
+    memory mapped rather than read, so the arrays are shared between all
+    processes loading the same file. With lazy, params, attributes and other
+    traits are only decoded for the objects a lookup or thaw reaches.
+
+    Like pickle, only load files from trusted sources.
+    """
+    with open(file_path, "rb") as f:
+        if mmap_mode:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{file_path} is not a solid_state scene file")
+
+    (header_len,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[header_start:header_start + header_len]))
+    data_start = _align(header_start + header_len)
+
+    arrays = {}
+    for name, (dtype, offset, count) in header["arrays"].items():
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + offset)
+        if not (lazy or mmap_mode):
+            array = array.copy()
+            array.setflags(write=False)
+
+        arrays[name] = array
+
+    blobs = {}
+    for name, (offset, length) in header["blobs"].items():
+        blobs[name] = memoryview(buffer)[data_start + offset:data_start + offset + length]
+
+    def _records(name):
+        cls = _PackedRecords if lazy else _unpack_records
+        return cls(arrays[f"{name}_keys"], arrays[f"{name}_offsets"], blobs[name])
+
+    tables = json.loads(bytes(blobs["tables"]))
+    param_key_table = pickle.loads(blobs["param_key_table"])
+    with frozen._gc_paused():
+        param_objects = _records("param_objects")
+        if lazy:
+            params = _PackedParams(arrays, param_key_table, param_objects)
+        else:
+            params = _unpack_params(arrays, param_key_table, param_objects)
+
+        return frozen._build(
+            **{name: arrays[name] for name in _SCENE_ARRAYS},
+            obj_name_table=tuple(tables["obj_name_table"]),
+            state_name_table=tuple(tables["state_name_table"]),
+            class_table=tuple(_import_class(c) for c in tables["class_table"]),
+            params=params,
+            attributes=_records("attributes"),
+            traits=_records("traits"),
+            extras=_records("extras"),
+        )
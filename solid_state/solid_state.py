@@ -1,5 +1,9 @@
+import contextlib
 from dataclasses import dataclass
+import functools
 import inspect
+import time
+import tracemalloc
 
 import solid
 
@@ -47,13 +51,69 @@ def save_state(name, attributes=None):
     return _save_state
 
 
+# Per solid_state name construction stats, only collected inside instrument()
+_instrumentation = None
+
+
+@contextlib.contextmanager
+def instrument():
+    """
+    Record the number of calls, construction time and allocated memory of
+    functions decorated with state, by solid_state name. Times and memory
+    include any nested states. Memory is measured with tracemalloc, which is
+    started if it isn't already running.
+    """
+    global _instrumentation
+
+    previous = _instrumentation
+    _instrumentation = {}
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    try:
+        yield _instrumentation
+
+    finally:
+        _instrumentation = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+# Functions to render as OpenSCAD modules, by solid_state name
+_modules = {}
+
+
 # TODO store wrapped function's arguments in attributes or another meta key?
-def state(name):
+def state(name, *, as_module=False):
     """
     Add solid_state metadata to an object returned from the decorated function.
+    With as_module, objects from the function can be rendered as calls to
+    an OpenSCAD module, see render_scad. Only one function can be a module
+    for each name.
     """
     def _state(func):
+        if as_module:
+            # the same function is registered again when its module is reloaded
+            previous = _modules.get(name)
+            if previous is not None and (
+                (previous.__module__, previous.__qualname__) != (func.__module__, func.__qualname__)
+            ):
+                raise ValueError(
+                    f"'{name}' is already a module for {previous.__module__}.{previous.__qualname__}"
+                )
+
+            _modules[name] = func
+
+        # wraps keeps the decorated function picklable by name, which
+        # parallel_map relies on to send it to worker processes
+        @functools.wraps(func)
         def _wrapper(*args, **kwargs):
+            instrumentation = _instrumentation
+            if instrumentation is not None:
+                start_time = time.perf_counter()
+                start_memory, _ = tracemalloc.get_traced_memory()
+
             scad_obj = func(*args, **kwargs)
 
             attributes = {}
@@ -82,7 +142,18 @@ def state(name):
             #
             # attributes.update(kwargs)
 
-            return save_state(name=name, attributes=attributes)(scad_obj)
+            scad_obj = save_state(name=name, attributes=attributes)(scad_obj)
+
+            if instrumentation is not None:
+                end_memory, _ = tracemalloc.get_traced_memory()
+                stats = instrumentation.setdefault(
+                    name, dict(calls=0, time=0.0, allocated=0)
+                )
+                stats["calls"] += 1
+                stats["time"] += time.perf_counter() - start_time
+                stats["allocated"] += end_memory - start_memory
+
+            return scad_obj
 
         return _wrapper
 
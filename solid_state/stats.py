@@ -0,0 +1,112 @@
+from collections import Counter
+import copy
+from dataclasses import dataclass, field
+from typing import Optional
+
+import solid_state.cache as cache
+import solid_state.frozen as frozen
+import solid_state.lookup as lookup
+
+
+@dataclass
+class StateStats:
+    name: str
+    instances: int = 0
+    nodes: int = 0
+    unique_nodes: int = 0
+    max_depth: int = 0
+    primitives: dict = field(default_factory=dict)
+    scad_size: int = 0
+    calls: Optional[int] = None
+    construction_time: Optional[float] = None
+    allocated: Optional[int] = None
+
+
+def _estimate_size(scad_obj, depth):
+    # Rendering mutates params, so render a shallow copy. Each line is
+    # indented by depth, and objects with children add a closing line.
+    size = len(copy.copy(scad_obj)._render_str_no_children()) + depth + 1
+    if scad_obj.children:
+        size += depth + 3
+
+    return size
+
+
+def _visit(scad_obj, depth, open_states, results, unique, fingerprint):
+    name = lookup.get_name(scad_obj)
+    if name is not None:
+        stats = results.setdefault(name, StateStats(name))
+        stats.instances += 1
+        open_states.append((stats, depth))
+
+    size = _estimate_size(scad_obj, depth)
+    node_fingerprint = fingerprint(scad_obj)
+    for stats, start_depth in open_states:
+        stats.nodes += 1
+        stats.scad_size += size
+        stats.max_depth = max(stats.max_depth, depth - start_depth)
+        unique.setdefault(stats.name, set()).add(node_fingerprint)
+        if not scad_obj.children:
+            stats.primitives[scad_obj.name] = stats.primitives.get(scad_obj.name, 0) + 1
+
+    for child in scad_obj.children:
+        _visit(child, depth + 1, open_states, results, unique, fingerprint)
+
+    if name is not None:
+        open_states.pop()
+
+
+def scene_stats(scad_obj, instrumentation=None):
+    """
+    Get statistics for each solid_state name in a scene: the number of
+    instances, the total number of objects in them, the number of distinct
+    objects by content, the deepest nesting, leaf objects by type and an
+    estimate of their size as SCAD code. When given the result of
+    solid_state.instrument(), the calls, construction time and allocated
+    memory of the state functions are included too.
+    """
+    if isinstance(scad_obj, frozen.FrozenScene):
+        scad_obj = frozen.thaw(scad_obj)
+
+    results = {}
+    unique = {}
+    _visit(scad_obj, 0, [], results, unique, cache.RenderCache().fingerprint)
+
+    for stats in results.values():
+        stats.unique_nodes = len(unique[stats.name])
+        stats.primitives = dict(Counter(stats.primitives).most_common())
+
+    for name, data in (instrumentation or {}).items():
+        stats = results.setdefault(name, StateStats(name))
+        stats.calls = data["calls"]
+        stats.construction_time = data["time"]
+        stats.allocated = data["allocated"]
+
+    return sorted(results.values(), key=lambda s: s.scad_size, reverse=True)
+
+
+def format_table(stats_list):
+    """
+    Format scene_stats results as a plain text table.
+    """
+    columns = [
+        ("name", lambda s: s.name),
+        ("instances", lambda s: s.instances),
+        ("nodes", lambda s: s.nodes),
+        ("unique", lambda s: s.unique_nodes),
+        ("depth", lambda s: s.max_depth),
+        ("scad size", lambda s: s.scad_size),
+        ("calls", lambda s: "" if s.calls is None else s.calls),
+        ("time (s)", lambda s: "" if s.construction_time is None else f"{s.construction_time:.4f}"),
+        ("memory", lambda s: "" if s.allocated is None else s.allocated),
+        ("primitives", lambda s: ", ".join(f"{k}: {v}" for k, v in s.primitives.items())),
+    ]
+
+    rows = [[title for title, _ in columns]]
+    rows += [[str(func(s)) for _, func in columns] for s in stats_list]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
@@ -0,0 +1,14 @@
+import solid
+
+from solid_state.solid_state import join, pipe, state
+
+
+# shared by the test modules, and importable by name so parallel_map can send
+# it to worker processes
+@state("snowman")
+def create_snowman(height):
+    return pipe(
+        solid.sphere(d=height / 3),
+        solid.translate([0, 0, height / 2]),
+        join(solid.sphere(d=height / 2)),
+    )
@@ -0,0 +1,90 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import solid
+
+from solid_state.aio import (
+    get_attributes_async,
+    get_objects_async,
+    render_scad_async,
+    render_scad_text_async,
+)
+from solid_state.frozen import freeze
+from solid_state.lookup import get_name
+from solid_state.render import render_scad, render_scad_text
+from solid_state.solid_state import save_state
+
+
+def create_scene():
+    obj1 = save_state("my-cube", dict(alpha=1))(solid.cube(5))
+    obj2 = save_state("my-sphere", dict(alpha=2))(solid.sphere(5))
+    return obj1 + obj2
+
+
+def _without_header(text):
+    return text.split("\n", 1)[1]
+
+
+def test_render_scad_async(tmp_path):
+    scene = create_scene()
+    semaphore = asyncio.Semaphore(2)
+
+    async def render_all():
+        return await asyncio.gather(
+            *[
+                render_scad_async(scene, tmp_path / f"{i}.scad", selector=".my-cube", semaphore=semaphore)
+                for i in range(5)
+            ]
+        )
+
+    paths = asyncio.run(render_all())
+
+    # the same text as render_scad, including SolidPython's source footer
+    expected_path = render_scad(scene, tmp_path / "expected.scad", selector=".my-cube")
+    expected = _without_header(open(expected_path).read())
+    assert "SolidPython code" in expected
+    for path in paths:
+        assert _without_header(path.read_text()) == expected
+
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_render_scad_async_cancel(tmp_path):
+    file_path = tmp_path / "scene.scad"
+
+    async def render_cancelled():
+        task = asyncio.create_task(render_scad_async(create_scene(), file_path))
+        await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+
+    assert asyncio.run(render_cancelled())
+    assert not file_path.exists()
+
+
+def test_render_scad_text_async_process_pool():
+    scene = freeze(create_scene())
+
+    async def render():
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return await render_scad_text_async(scene, executor=executor)
+
+    assert _without_header(asyncio.run(render())) == _without_header(render_scad_text(scene))
+
+
+def test_lookup_async():
+    scene = create_scene()
+
+    async def lookup():
+        return await asyncio.gather(
+            get_objects_async(scene, ".my-sphere"),
+            get_attributes_async(scene, ".my-cube"),
+        )
+
+    objects, attributes = asyncio.run(lookup())
+
+    assert [get_name(o) for o in objects] == ["my-sphere"]
+    assert attributes == dict(alpha=1)
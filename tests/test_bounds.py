@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+import solid
+
+from solid_state.frozen import freeze
+from solid_state.lookup import _frozen_copy, get_bounds, get_objects, get_transformations, prune
+from solid_state.scad_reader import scan_scad
+from solid_state.solid_state import save_state
+
+
+def create_scene():
+    cubes = [
+        save_state("box", dict(index=i))(solid.translate([i * 10, 0, 0])(solid.cube(2)))
+        for i in range(3)
+    ]
+    ball = save_state("ball")(solid.translate([0, 0, 10])(solid.sphere(d=4)))
+    return solid.union()(*cubes, ball)
+
+
+def test_primitives():
+    assert np.allclose(get_bounds(solid.cube([1, 2, 3], center=True)), [[-0.5, -1, -1.5], [0.5, 1, 1.5]])
+    assert np.allclose(get_bounds(solid.sphere(r=2)), [[-2, -2, -2], [2, 2, 2]])
+    assert np.allclose(get_bounds(solid.cylinder(h=2, d1=4, d2=2)), [[-2, -2, 0], [2, 2, 2]])
+    assert np.allclose(
+        get_bounds(solid.polyhedron(points=[[0, 0, 0], [1, 0, 0], [0, 2, 0], [0, 0, 3]], faces=[])),
+        [[0, 0, 0], [1, 2, 3]],
+    )
+
+    # objects without geometry
+    assert np.isnan(get_bounds(solid.union())).all()
+
+
+def test_transformations():
+    assert np.allclose(get_bounds(solid.translate([1, 2, 3])(solid.cube(2))), [[1, 2, 3], [3, 4, 5]])
+    assert np.allclose(get_bounds(solid.scale([1, 2, 3])(solid.cube(1))), [[0, 0, 0], [1, 2, 3]])
+    assert np.allclose(get_bounds(solid.rotate([0, 0, 90])(solid.cube([2, 1, 1]))), [[-1, 0, 0], [0, 2, 1]])
+    assert np.allclose(get_bounds(solid.rotate(90, [1, 0, 0])(solid.cube(1))), [[0, -1, 0], [1, 0, 1]])
+    assert np.allclose(get_bounds(solid.mirror([1, 0, 0])(solid.cube(1))), [[-1, 0, 0], [0, 1, 1]])
+    assert np.allclose(
+        get_bounds(solid.multmatrix([[1, 0, 0, 5], [0, 1, 0, 0], [0, 0, 1, 0]])(solid.cube(1))),
+        [[5, 0, 0], [6, 1, 1]],
+    )
+
+
+def test_operations():
+    second = solid.translate([5, 0, 0])(solid.cube(1))
+    assert np.allclose(get_bounds(solid.cube(2) + second), [[0, 0, 0], [6, 2, 2]])
+    assert np.allclose(get_bounds(solid.cube(2) - second), [[0, 0, 0], [2, 2, 2]])
+    assert np.allclose(
+        get_bounds(solid.intersection()(solid.cube(2), solid.translate([1, 0, 0])(solid.cube(2)))),
+        [[1, 0, 0], [2, 2, 2]],
+    )
+
+    extruded = solid.translate([0, 0, 1])(
+        solid.linear_extrude(height=3, center=True)(solid.translate([1, 0])(solid.square(2)))
+    )
+    assert np.allclose(get_bounds(extruded), [[1, 0, -0.5], [3, 2, 2.5]])
+    assert np.allclose(get_bounds(extruded, "square"), [[[1, 0, 1], [3, 2, 1]]])
+
+    ring = solid.rotate_extrude()(solid.translate([2, 0])(solid.circle(1)))
+    assert np.allclose(get_bounds(ring), [[-3, -3, -1], [3, 3, 1]])
+
+
+def test_sized_operations():
+    assert np.allclose(
+        get_bounds(solid.minkowski()(solid.cube(10), solid.sphere(2))),
+        [[-2, -2, -2], [12, 12, 12]],
+    )
+    assert np.allclose(
+        get_bounds(
+            solid.translate([5, 0, 0])(
+                solid.minkowski()(
+                    solid.translate([1, 0, 0])(solid.cube(10)),
+                    solid.translate([0, 0, 3])(solid.sphere(2)),
+                )
+            )
+        ),
+        [[4, -2, 1], [18, 12, 15]],
+    )
+    assert np.allclose(get_bounds(solid.resize([100, 100, 100])(solid.cube(1))), [[0, 0, 0], [100, 100, 100]])
+    assert np.allclose(
+        get_bounds(solid.linear_extrude(1)(solid.offset(r=5)(solid.square(2)))),
+        [[-5, -5, 0], [7, 7, 1]],
+    )
+    assert np.allclose(
+        get_bounds(solid.projection()(solid.translate([0, 0, 5])(solid.cube(2)))),
+        [[0, 0, 0], [2, 2, 0]],
+    )
+
+
+def test_unbounded():
+    scene = solid.union()(solid.cube(1), solid.translate([1, 0, 0])(solid.import_("part.stl")))
+
+    assert np.isinf(get_bounds(scene)).all()
+    assert np.isinf(get_bounds(scene, "import")).all()
+    assert np.allclose(get_bounds(scene, "cube"), [[[0, 0, 0], [1, 1, 1]]])
+    assert np.isinf(get_bounds(solid.linear_extrude(1)(solid.text("hi")))).all()
+
+    # unbounded objects are never within a box
+    assert len(get_objects(scene, ":within(-100, -100, -100, 100, 100, 100)")) == 1
+
+
+def test_get_bounds():
+    scene = create_scene()
+
+    bounds = get_bounds(scene, ".box")
+    assert bounds.shape == (3, 2, 3)
+    assert np.allclose(bounds[:, 0, 0], [0, 10, 20])
+    assert np.allclose(get_bounds(scene), [[-2, -2, 0], [22, 2, 12]])
+    assert np.allclose(get_bounds(scene, ".box", exclude=".box cube"), bounds)
+    assert np.allclose(get_bounds(freeze(scene), ".box"), bounds)
+
+
+def test_get_bounds_reuses_frozen_copy():
+    scene = create_scene()
+
+    frozen = _frozen_copy(scene)
+    get_bounds(scene)
+    get_objects(scene, ".box:within(5, -1, -1, 25, 3, 3)")
+    assert _frozen_copy(scene) is frozen
+
+    # the tree is frozen again after objects are added to it
+    scene.add(solid.translate([30, 0, 0])(solid.cube(2)))
+    assert _frozen_copy(scene) is not frozen
+    assert np.allclose(get_bounds(scene), [[-2, -2, 0], [32, 2, 12]])
+
+
+def test_within():
+    scene = create_scene()
+    query = ".box:within(5, -1, -1, 25, 3, 3)"
+
+    objects = get_objects(scene, query)
+    assert [o.get_trait("solid_state")["attributes"]["index"] for o in objects] == [1, 2]
+    assert len(get_objects(freeze(scene), query)) == 2
+    assert len(get_transformations(scene, query)) == 2
+    assert len(get_objects(scene, ":within(-5, -5, -5, 5, 5, 5)")) == 3
+    assert len(get_objects(scene, ".box", exclude=":within(5, -1, -1, 25, 3, 3)")) == 1
+
+    pruned = prune(scene, query)
+    assert len(get_objects(pruned, ".box")) == 1
+    assert len(get_objects(scene, ".box")) == 3
+    assert len(prune(freeze(scene), query)) == len(freeze(pruned))
+
+
+def test_within_scad_file(tmp_path):
+    file_path = tmp_path / "scene.scad"
+    file_path.write_text("cube(1);")
+
+    with pytest.raises(ValueError):
+        list(scan_scad(file_path, "cube:within(0, 0, 0, 1, 1, 1)"))
@@ -0,0 +1,83 @@
+import time
+
+import solid
+
+from solid_state.cache import RenderCache
+from solid_state.render import scad_text
+from solid_state.solid_state import state
+
+from tests.conftest import create_snowman
+
+
+@state("snowmen")
+def create_snowmen(heights):
+    return solid.union()(
+        *[solid.translate([i * 10, 0, 0])(create_snowman(h)) for i, h in enumerate(heights)]
+    )
+
+
+def test_fingerprint():
+    cache = RenderCache()
+
+    assert cache.fingerprint(create_snowman(10)) == cache.fingerprint(create_snowman(10))
+    assert cache.fingerprint(create_snowman(10)) != cache.fingerprint(create_snowman(20))
+    assert cache.fingerprint(solid.cube(5)) != cache.fingerprint(solid.cube(5).set_modifier("#"))
+
+
+def test_render_cache():
+    cache = RenderCache()
+
+    scene = create_snowmen([10, 20, 30])
+    expected = scene._render()
+
+    assert scad_text(create_snowmen([10, 20, 30]), cache=cache) == expected
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    assert scad_text(create_snowmen([10, 20, 30]), cache=cache) == expected
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    # only the changed snowman and its parent are rendered again
+    changed = create_snowmen([10, 25, 30])
+    assert scad_text(changed, cache=cache) == create_snowmen([10, 25, 30])._render()
+    assert (cache.hits, cache.misses) == (3, 6)
+
+
+def test_render_cache_annotate():
+    cache = RenderCache()
+
+    annotated = scad_text(create_snowmen([10, 20]), annotate=True, cache=cache)
+    assert annotated == scad_text(create_snowmen([10, 20]), annotate=True)
+    assert scad_text(create_snowmen([10, 20]), cache=cache) == create_snowmen([10, 20])._render()
+
+
+def test_render_cache_directory(tmp_path):
+    expected = scad_text(create_snowmen([10, 20]), cache=RenderCache(tmp_path))
+
+    cache = RenderCache(tmp_path)
+    assert scad_text(create_snowmen([10, 20]), cache=cache) == expected
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_render_cache_speedup():
+    def create_scene(changed):
+        return solid.union()(
+            *[create_snowmen([i + j + (i == changed) for j in range(10)]) for i in range(50)]
+        )
+
+    def best_time(func):
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    cache = RenderCache()
+    scad_text(create_scene(None), cache=cache)
+
+    # new scenes with one changed part, as a generator would make each time
+    scenes = [create_scene(5) for _ in range(6)]
+    uncached = best_time(lambda: scad_text(scenes.pop()))
+    cached = best_time(lambda: scad_text(scenes.pop(), cache=cache))
+
+    assert cached < uncached / 2
@@ -0,0 +1,169 @@
+import os
+
+import pytest
+import solid
+
+from solid_state.cache import RenderCache
+from solid_state.compiler import Modules, _module_name, trace
+from solid_state.lookup import replace, update_attributes
+from solid_state.render import render_scad_text, scad_text
+from solid_state.scad_reader import count_scad_objects
+from solid_state.solid_state import join, pipe, state
+
+
+@state("compiled-snowman", as_module=True)
+def create_snowman(height, neck=1):
+    return pipe(
+        solid.sphere(d=height / 3),
+        solid.translate([0, 0, height / 3 - neck]),
+        join(solid.sphere(d=height / 2)),
+    )
+
+
+@state("compiled-row", as_module=True)
+def create_row(height):
+    return create_snowman(height) + solid.translate([10, 0, 0])(create_snowman(-(height * 2)))
+
+
+@state("branching", as_module=True)
+def create_branching(size):
+    return solid.cube(size) if size > 1 else solid.sphere(size)
+
+
+@state("inline-snowman")
+def create_inline_snowman(height):
+    return create_snowman.__wrapped__(height)
+
+
+SNOWMAN = _module_name("compiled-snowman")
+ROW = _module_name("compiled-row")
+
+
+def test_trace():
+    module = trace("compiled-snowman")
+
+    assert module.name == SNOWMAN
+    assert module.params == ["height", "neck"]
+    assert scad_text(module.body) == (
+        "\nunion() {"
+        "\n\ttranslate(v = [0, 0, height / 3 - neck]) {\n\t\tsphere(d = height / 3);\n\t}"
+        "\n\tsphere(d = height / 2);\n}"
+    )
+
+    # branching on a parameter needs its value
+    assert trace("branching") is None
+    assert trace("inline-snowman") is None
+
+
+def test_render_modules():
+    scene = solid.union()(
+        create_snowman(10),
+        create_snowman(20, neck=2),
+        create_row(3),
+        create_branching(2),
+    )
+
+    text = scad_text(scene, modules=True)
+
+    assert text.count(f"module {SNOWMAN}(height, neck) {{") == 1
+    assert text.count(f"module {ROW}(height) {{") == 1
+    assert f"{SNOWMAN}(height = 10, neck = 1);" in text
+    assert f"{SNOWMAN}(height = 20, neck = 2);" in text
+    assert f"{SNOWMAN}(height = -(height * 2), neck = 1);" in text
+    assert f"{ROW}(height = 3);" in text
+    assert "module branching" not in text
+    assert "cube(size = 2);" in text
+
+    # the same objects rendered inline without modules
+    assert "module" not in scad_text(scene, annotate=True)
+
+
+def test_render_modules_fallback():
+    snowman = create_snowman(10)
+    # modified after it was created, so it no longer matches the module
+    snowman.children[0].add(solid.cube(1))
+
+    text = scad_text(snowman, modules=True)
+    assert "module" not in text
+    assert "cube(size = 1);" in text
+
+
+def test_scan_modules(tmp_path):
+    scene = create_row(3) + create_snowman(4)
+    file_path = os.path.join(tmp_path, "scene.scad")
+    with open(file_path, "w") as f:
+        f.write(render_scad_text(scene, annotate=True, modules=True))
+
+    # objects inside module definitions aren't part of the scene
+    assert count_scad_objects(file_path, ".compiled-snowman") == 1
+    assert count_scad_objects(file_path, ".compiled-row") == 1
+
+
+def test_render_modules_edited():
+    scene = solid.union()(solid.translate([1, 0, 0])(create_snowman(10)), create_snowman(20))
+
+    # the structure is unchanged, but the params no longer match
+    updated = update_attributes(scene, "translate .compiled-snowman", height=50)
+    text = scad_text(updated, modules=True)
+    assert f"{SNOWMAN}(height = 50, neck = 1);" not in text
+    assert f"{SNOWMAN}(height = 20, neck = 1);" in text
+
+    replaced = replace(scene, ".compiled-snowman translate sphere", lambda s: solid.sphere(d=7))
+    text = scad_text(replaced, modules=True)
+    assert "module" not in text
+    assert text.count("sphere(d = 7);") == 2
+
+
+@state("peg-a", as_module=True)
+def create_peg_dash(height):
+    return solid.cylinder(h=height, d=1)
+
+
+@state("peg_a", as_module=True)
+def create_peg_underscore(height):
+    return solid.cube([1, 1, height])
+
+
+def test_module_names():
+    text = scad_text(create_peg_dash(2) + create_peg_underscore(3), modules=True)
+
+    # changed names get a hash of the solid_state name, so they don't
+    # depend on what else is rendered
+    dash_name = _module_name("peg-a")
+    assert dash_name.startswith("peg_a_")
+    assert _module_name("peg_a") == "peg_a"
+    assert _module_name("cube").startswith("solid_state_cube_")
+
+    assert f"module {dash_name}(height) {{" in text
+    assert "module peg_a(height) {" in text
+    assert f"{dash_name}(height = 2);" in text
+    assert "peg_a(height = 3);" in text
+
+
+@state("peg-holder")
+def create_peg_holder(height):
+    return solid.translate([1, 0, 0])(create_peg_underscore(height))
+
+
+def test_module_names_cache():
+    cache = RenderCache()
+    first = scad_text(create_peg_holder(5), cache=cache, modules=True)
+
+    # cached code of the holder calls the same module in any render
+    text = scad_text(create_peg_dash(7) + create_peg_holder(5), cache=cache, modules=True)
+    assert cache.hits == 1
+    assert "peg_a(height = 5);" in first
+    assert "peg_a(height = 5);" in text
+    assert text.count("module peg_a(height) {\n\tcube(size = [1, 1, height]);\n}") == 1
+
+    # code cached before a function became a module isn't reused
+    key = Modules().key
+    state("peg-holder-module", as_module=True)(create_peg_holder.__wrapped__)
+    assert Modules().key != key
+
+
+def test_module_registered_twice():
+    with pytest.raises(ValueError):
+        @state("compiled-snowman", as_module=True)
+        def create_other_snowman(height):
+            return solid.sphere(height)
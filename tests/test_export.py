@@ -0,0 +1,98 @@
+import os
+import sys
+
+from solid_state.export import export_scad
+
+
+# Stand-in for OpenSCAD: copies the input to the output, in upper case.
+# Files containing "fail" fail and files containing "slow" sleep, until a
+# marker file next to the input exists.
+FAKE_EXPORT = """
+import os
+import sys
+import time
+
+input_path, output_path = sys.argv[1:]
+text = open(input_path).read()
+marker = input_path + ".attempted"
+first_attempt = not os.path.exists(marker)
+open(marker, "w").close()
+
+if "fail" in text:
+    sys.exit("failed " + input_path)
+
+if "slow" in text and first_attempt:
+    time.sleep(10)
+
+with open(output_path, "w") as f:
+    f.write(text.upper())
+"""
+
+
+def create_command(tmp_path):
+    script = tmp_path / "fake_export.py"
+    script.write_text(FAKE_EXPORT)
+    return [sys.executable, str(script), "{input}", "{output}"]
+
+
+def test_export_scad(tmp_path):
+    command = create_command(tmp_path)
+    inputs = []
+    for i in range(4):
+        inputs.append(tmp_path / f"part_{i}.scad")
+        inputs[-1].write_text(f"cube({i});")
+
+    progress = []
+    results = export_scad(
+        inputs,
+        command=command,
+        workers=2,
+        progress=lambda r, finished, total: progress.append((finished, total)),
+    )
+
+    assert [r.status for r in results] == ["done"] * 4
+    assert [r.input for r in results] == [str(p) for p in inputs]
+    assert (tmp_path / "part_2.stl").read_text() == "CUBE(2);"
+    assert sorted(progress) == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+    # unchanged inputs are skipped
+    inputs[1].write_text("sphere(1);")
+    results = export_scad(inputs, command=command, workers=2)
+
+    assert [r.status for r in results] == ["skipped", "done", "skipped", "skipped"]
+    assert (tmp_path / "part_1.stl").read_text() == "SPHERE(1);"
+
+    # as is a new render time
+    inputs[2].write_text("// Generated by SolidPython on 2000-01-01\ncube(2);")
+    results = export_scad(inputs, command=command)
+    assert results[2].status == "skipped"
+
+    results = export_scad(inputs, command=command, workers=2, force=True)
+    assert [r.status for r in results] == ["done"] * 4
+
+    results = export_scad(inputs, export_format="3mf", command=command)
+    assert [r.status for r in results] == ["done"] * 4
+    assert os.path.exists(tmp_path / "part_0.3mf")
+
+
+def test_export_scad_failures(tmp_path):
+    command = create_command(tmp_path)
+    failing = tmp_path / "failing.scad"
+    failing.write_text("fail();")
+    slow = tmp_path / "slow.scad"
+    slow.write_text("slow();")
+
+    results = export_scad([failing, slow], command=command, timeout=1, retries=1)
+
+    assert results[0].status == "failed"
+    assert results[0].attempts == 2
+    assert results[0].returncode == 1
+    assert "failed" in results[0].error
+
+    # times out on the first attempt, then succeeds
+    assert results[1].status == "done"
+    assert results[1].attempts == 2
+
+    # failed jobs are always retried
+    results = export_scad([failing, slow], command=command)
+    assert [r.status for r in results] == ["failed", "skipped"]
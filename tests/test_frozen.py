@@ -0,0 +1,186 @@
+import pickle
+
+import pytest
+import solid
+
+from solid_state.frozen import FrozenScene, freeze, get_indices, get_path, thaw
+from solid_state.lookup import (
+    get_attributes,
+    get_name,
+    get_objects,
+    get_transformations,
+    prune,
+    replace,
+    update_attributes,
+)
+from solid_state.bounds import scene_bounds
+from solid_state.solid_state import save_state
+
+
+def create_scene():
+    obj1a = save_state("my-cube", dict(alpha=1))(solid.cube(5))
+    obj1b = save_state("my-sphere", dict(alpha=2))(solid.sphere(5))
+    parent1 = save_state("parent-1")(solid.translate([1, 2, 3])(obj1a + obj1b))
+
+    obj2a = save_state("my-cube", dict(alpha=3))(solid.cube(5))
+    obj2b = save_state("my-cube", dict(alpha=4))(solid.cube(5).set_modifier("#"))
+    parent2 = save_state("parent-2")(solid.rotate([4, 5, 6])(obj2a + obj2b))
+
+    return solid.mirror([1, 0, 0])(parent1 + parent2)
+
+
+def test_freeze():
+    scene = freeze(create_scene())
+
+    assert isinstance(scene, FrozenScene)
+    assert len(scene) == 16
+    assert scene.parent[0] == -1
+    assert scene.first_child[0] == 1
+    assert scene.next_sibling[0] == -1
+    assert scene.end[0] == 16
+    assert get_name(scene) is None
+
+    # arrays can't be modified in place
+    with pytest.raises(ValueError):
+        scene.parent[0] = 1
+
+
+def test_thaw():
+    scad_obj = create_scene()
+    thawed = thaw(freeze(scad_obj))
+
+    assert solid.scad_render(thawed) == solid.scad_render(scad_obj)
+    assert [get_attributes(o) for o in get_objects(thawed, ".my-cube")] == [
+        dict(alpha=1),
+        dict(alpha=3),
+        dict(alpha=4),
+    ]
+    assert all(child.parent is thawed for child in thawed.children)
+
+
+def test_thaw_deep():
+    scad_obj = solid.polygon([[0, 0], [1, 0], [0, 1]])
+    for _ in range(3000):
+        scad_obj = solid.translate([1, 0, 0])(scad_obj)
+
+    thawed = thaw(freeze(scad_obj))
+
+    # too deep to pickle as a tree, but not as a scene
+    assert len(pickle.dumps(freeze(thawed))) > 0
+    obj = thawed
+    while obj.children:
+        obj = obj.children[0]
+    assert obj.params["points"] == [(0, 0), (1, 0), (0, 1)]
+
+
+@pytest.mark.parametrize(
+    "query, exclude",
+    [
+        ("cube", None),
+        (".my-cube", None),
+        (".parent-2 .my-cube", None),
+        ("mirror translate", None),
+        ("translate:not(.my-cube)", None),
+        ("sphere, .my-cube", None),
+        (".my-cube", ".parent-1"),
+        ("cube", ".parent-2 translate"),
+    ],
+)
+def test_frozen_lookup(query, exclude):
+    scad_obj = create_scene()
+    scene = freeze(scad_obj)
+
+    expected = get_objects(scad_obj, query, exclude)
+    result = get_objects(scene, query, exclude)
+
+    assert len(get_indices(scene, query, exclude)) == len(expected)
+    assert [solid.scad_render(o) for o in result] == [
+        solid.scad_render(o) for o in expected
+    ]
+
+    expected_transformations = get_transformations(scad_obj, query, exclude)
+    result_transformations = get_transformations(scene, query, exclude)
+    assert [[t.params for t in ts] for ts in result_transformations] == [
+        [t.params for t in ts] for ts in expected_transformations
+    ]
+
+
+def test_freeze_copies():
+    scad_obj = save_state("my-cube", dict(sizes=[1, 2]))(solid.translate([1, 2, 3])(solid.cube(5)))
+    scene = freeze(scad_obj)
+
+    # editing the original tree, or a thawed copy, leaves the scene as is
+    scad_obj.children[0].params["v"][0] = 10
+    scad_obj.get_trait("solid_state")["attributes"]["sizes"].append(3)
+    thaw(scene).children[0].params["v"][1] = 20
+    get_attributes(scene)["sizes"].append(4)
+
+    assert scene.params[1]["v"] == [1, 2, 3]
+    assert get_attributes(scene) == dict(sizes=[1, 2])
+
+
+def test_get_path():
+    scad_obj = create_scene()
+    scene = freeze(scad_obj)
+
+    for index in range(len(scene)):
+        obj = scad_obj
+        for step in get_path(scene, index):
+            obj = obj.children[step]
+
+        assert solid.scad_render(obj) == solid.scad_render(thaw(scene, index))
+
+    assert get_path(scene, 0) == ()
+
+
+def test_frozen_get_attributes():
+    scene = freeze(create_scene())
+
+    assert get_attributes(scene, ".parent-1 .my-cube") == dict(alpha=1)
+    assert get_attributes(scene, ".my-sphere") == dict(alpha=2)
+
+    with pytest.raises(Exception):
+        get_attributes(scene, ".parent-2 .my-cube")
+
+
+def test_frozen_prune():
+    scad_obj = create_scene()
+    scene = freeze(scad_obj)
+
+    result = prune(scene, ".my-sphere, .parent-2 .my-cube")
+
+    assert len(result) == 10
+    assert solid.scad_render(thaw(result)) == solid.scad_render(
+        prune(scad_obj, ".my-sphere, .parent-2 .my-cube")
+    )
+    assert prune(scene, ".does-not-exist") is scene
+    assert prune(scene, "mirror") is None
+
+
+@pytest.mark.parametrize("query", ["sphere", ".my-cube", "mirror", ".parent-2, .parent-2 cube"])
+def test_frozen_replace(query):
+    scad_obj = create_scene()
+    scene = freeze(scad_obj)
+
+    for func in (lambda obj: None, lambda obj: solid.color("red")(obj)):
+        expected = replace(scad_obj, query, func)
+        result = replace(scene, query, func)
+        if expected is None:
+            assert result is None
+        else:
+            assert solid.scad_render(thaw(result)) == solid.scad_render(expected)
+            assert len(result) == len(freeze(expected))
+
+    assert replace(scene, ".does-not-exist", lambda obj: None) is scene
+
+
+def test_frozen_update_attributes():
+    scene = freeze(create_scene())
+    bounds = scene_bounds(scene)
+
+    result = update_attributes(scene, ".my-cube", beta=1)
+
+    assert get_attributes(result, ".parent-1 .my-cube") == dict(alpha=1, beta=1)
+    assert get_attributes(scene, ".parent-1 .my-cube") == dict(alpha=1)
+    assert result.parent is scene.parent
+    assert scene_bounds(result) is bounds
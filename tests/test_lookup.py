@@ -9,7 +9,12 @@ from solid_state.lookup import (
     get_object,
     get_objects,
     get_transformations,
+    prune,
+    replace,
+    update_attributes,
 )
+from solid_state.cache import RenderCache
+from solid_state.render import render_scad_text
 
 
 def test_get_name():
@@ -143,6 +148,125 @@ def test_get_objects_by_path():
     assert get_name(res2[1]) == "my-cube"
 
 
+def test_get_objects_negation():
+    obj1 = save_state("my-cube")(solid.cube(5))
+    obj2 = save_state("my-sphere")(solid.sphere(5))
+    obj3 = save_state("my-other-sphere")(solid.sphere(5))
+    combined = obj1 + obj2 + obj3
+
+    res1 = get_objects(combined, "translate:not(.my-cube)")
+    res2 = get_objects(combined, "translate:not(.my-cube, .my-sphere)")
+
+    assert [get_name(o) for o in res1] == ["my-sphere", "my-other-sphere"]
+    assert [get_name(o) for o in res2] == ["my-other-sphere"]
+
+
+def test_render_negation():
+    obj1 = save_state("my-cube")(solid.cube(5))
+    obj2 = save_state("my-sphere")(solid.sphere(5))
+    obj3 = save_state("my-other-sphere")(solid.scale(3)(solid.sphere(5)))
+    combined = obj1 + obj2 + obj3
+
+    text = render_scad_text(combined, selector="translate:not(.my-cube, .my-sphere), cube", colorize=False)
+    assert text.count("sphere(") == 1
+    assert text.count("cube(size = 5)") == 1
+
+    text = render_scad_text(
+        combined,
+        selector="translate:not(.my-cube, .my-other-sphere), sphere:within(-10, -10, -10, 10, 10, 10)",
+        colorize=False,
+    )
+    assert text.count("sphere(") == 2
+    assert "cube(size = 5)" not in text
+
+
+def test_get_objects_exclude():
+    obj1a = save_state("my-cube")(solid.cube(5))
+    obj1b = save_state("my-sphere")(solid.sphere(5))
+    parent1 = save_state("parent-1")(solid.translate([1, 2, 3])(obj1a + obj1b))
+
+    obj2a = save_state("my-cube")(solid.cube(5))
+    parent2 = save_state("parent-2")(solid.translate([4, 5, 6])(obj2a))
+
+    combined = parent1 + parent2
+
+    assert len(get_objects(combined, ".my-cube", exclude=".parent-1")) == 1
+    assert len(get_objects(combined, ".my-cube", exclude=".my-cube")) == 0
+    assert len(get_objects(combined, "cube", exclude=".parent-2 .my-cube")) == 1
+    assert len(get_objects(combined, "sphere, cube", exclude=".my-sphere")) == 2
+
+
+def test_prune():
+    obj1 = save_state("my-cube")(solid.cube(5))
+    obj2 = save_state("my-sphere")(solid.sphere(5))
+    parent1 = save_state("parent-1")(solid.translate([1, 2, 3])(obj1 + obj2))
+    parent2 = save_state("parent-2")(solid.sphere(3))
+    combined = parent1 + parent2
+
+    result = prune(combined, ".my-sphere")
+
+    assert len(get_objects(result, ".my-sphere")) == 0
+    assert len(get_objects(result, ".my-cube")) == 1
+    assert len(get_objects(combined, ".my-sphere")) == 1
+
+    # untouched subtrees are shared with the original
+    assert result is not combined
+    assert result.children[1] is parent2
+    assert get_object(result, ".my-cube") is obj1
+
+    assert prune(combined, ".does-not-exist") is combined
+    assert prune(combined, "union") is None
+
+
+def test_replace():
+    obj1 = save_state("my-cube")(solid.cube(5))
+    obj2 = save_state("my-sphere")(solid.sphere(5))
+    parent1 = save_state("parent-1")(solid.translate([1, 2, 3])(obj1 + obj2))
+    parent2 = save_state("parent-2")(solid.sphere(3))
+    combined = parent1 + parent2
+
+    cache = RenderCache()
+    fingerprint = cache.fingerprint(combined)
+
+    result = replace(combined, ".my-sphere", lambda obj: save_state("my-cylinder")(solid.cylinder(1)))
+
+    assert len(get_objects(result, ".my-sphere")) == 0
+    assert len(get_objects(result, ".my-cylinder")) == 1
+    assert get_object(result, ".my-cube") is obj1
+    assert result.children[1] is parent2
+
+    # the original is untouched
+    assert get_object(combined, ".my-sphere") is obj2
+    assert cache.fingerprint(combined) == fingerprint
+    assert RenderCache().fingerprint(combined) == fingerprint
+
+    # nested matches are replaced first
+    result = replace(combined, "sphere, .parent-1", lambda obj: solid.color("red")(obj))
+    assert len(get_objects(result, "color sphere")) == 2
+    assert len(get_objects(result, "color .parent-1 color sphere")) == 1
+
+    assert len(get_objects(replace(combined, "sphere", lambda obj: None), "sphere")) == 0
+    assert replace(combined, ".does-not-exist", lambda obj: None) is combined
+
+
+def test_update_attributes():
+    obj1 = save_state("my-cube", dict(alpha=1))(solid.cube(5))
+    obj2 = save_state("my-cube", dict(alpha=2))(solid.cube(5))
+    combined = obj1 + obj2
+
+    result = update_attributes(combined, ".my-cube", beta=3)
+
+    assert [get_attributes(o) for o in get_objects(result, ".my-cube")] == [
+        dict(alpha=1, beta=3),
+        dict(alpha=2, beta=3),
+    ]
+    assert get_attributes(obj1) == dict(alpha=1)
+    assert result.children[0] is not obj1
+
+    with pytest.raises(Exception):
+        update_attributes(combined, "union", beta=3)
+
+
 def test_get_object():
     obj1 = save_state("my-cube", dict(alpha=1, beta=2))(solid.cube(5))
     obj2 = save_state("my-sphere", dict(alpha=3, beta=4))(solid.sphere(5))
@@ -0,0 +1,77 @@
+import numpy as np
+import solid
+
+from solid_state.frozen import freeze
+from solid_state.overlaps import Overlap, find_overlaps
+from solid_state.solid_state import save_state
+
+
+def create_scene():
+    return solid.union()(
+        save_state("bolt")(solid.cylinder(h=5, r=1)),
+        save_state("plate")(solid.cube([10, 10, 1])),
+        save_state("plate")(solid.translate([10, 0, 0])(solid.cube([10, 10, 1]))),
+        save_state("bolt")(solid.translate([50, 0, 0])(solid.cylinder(h=5, r=1))),
+    )
+
+
+def test_find_overlaps():
+    scene = create_scene()
+
+    assert find_overlaps(scene, ".bolt, .plate") == [Overlap("bolt", (0,), "plate", (1,))]
+    assert find_overlaps(freeze(scene), ".bolt, .plate") == find_overlaps(scene, ".bolt, .plate")
+    assert find_overlaps(scene, ".bolt, cube") == [Overlap("bolt", (0,), "cube", (1, 0))]
+
+    # plates only touch, and objects don't overlap their own children
+    assert find_overlaps(scene, ".plate") == []
+    assert find_overlaps(scene, ".bolt, .bolt cylinder") == []
+
+    assert find_overlaps(scene, ".bolt, .plate", exclude=".bolt") == []
+    assert find_overlaps(scene, ".missing, .plate") == []
+
+
+def test_find_overlaps_many():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 100, (300, 3))
+    scene = solid.union()(
+        *[save_state("part")(solid.translate(list(p))(solid.cube(5))) for p in positions]
+    )
+
+    expected = [
+        (i, j)
+        for i in range(len(positions))
+        for j in range(i + 1, len(positions))
+        if (np.abs(positions[i] - positions[j]) < 5).all()
+    ]
+    overlaps = find_overlaps(scene, ".part")
+    assert [(o.first_path[0], o.second_path[0]) for o in overlaps] == expected
+
+
+def test_find_overlaps_unbounded():
+    scene = solid.union()(
+        save_state("rounded")(solid.minkowski()(solid.cube(10), solid.sphere(2))),
+        save_state("block")(solid.translate([11, 0, 0])(solid.cube(5))),
+        save_state("imported")(solid.translate([100, 0, 0])(solid.import_("part.stl"))),
+        save_state("empty")(solid.union()),
+    )
+
+    assert find_overlaps(scene, ".rounded, .block") == [Overlap("rounded", (0,), "block", (1,))]
+
+    # objects of unknown size may overlap anything, empty ones nothing
+    assert find_overlaps(scene, ".imported, .block, .empty") == [
+        Overlap("block", (1,), "imported", (2,), unbounded=True)
+    ]
+
+
+def test_find_overlaps_flat():
+    scene = solid.union()(
+        save_state("sheet")(solid.square(10)),
+        save_state("sheet")(solid.translate([5, 5, 0])(solid.square(10))),
+        save_state("sheet")(solid.translate([30, 0, 0])(solid.circle(2))),
+        save_state("block")(solid.translate([30, 0, 0])(solid.cube(5))),
+    )
+
+    # 2D objects have no thickness, but still overlap in their plane
+    assert find_overlaps(scene, ".sheet") == [Overlap("sheet", (0,), "sheet", (1,))]
+    # and overlap 3D objects they lie against
+    assert find_overlaps(scene, ".sheet, .block") == [Overlap("sheet", (2,), "block", (3,))]
@@ -0,0 +1,34 @@
+import solid
+
+from solid_state.lookup import get_attributes, get_name, get_objects
+from solid_state.parallel import parallel_map
+from solid_state.solid_state import join, pipe
+
+from tests.conftest import create_snowman
+
+
+def test_parallel_map():
+    heights = [10, 15, 20, 25, 30]
+
+    expected = [create_snowman(h) for h in heights]
+    result = parallel_map(create_snowman, heights, workers=2)
+
+    assert len(result) == len(heights)
+    assert [solid.scad_render(o) for o in result] == [
+        solid.scad_render(o) for o in expected
+    ]
+    assert [get_name(o) for o in result] == ["snowman"] * 5
+    assert [get_attributes(o) for o in result] == [dict(height=h) for h in heights]
+
+
+def test_parallel_map_join():
+    snowmen = parallel_map(create_snowman, [10, 20], workers=2)
+    scene = pipe(snowmen[0], solid.translate([10, 0, 0]), join(snowmen[1]))
+
+    assert len(get_objects(scene, ".snowman")) == 2
+
+
+def test_parallel_map_serial():
+    result = parallel_map(create_snowman, [10, 20], workers=1)
+
+    assert [get_attributes(o) for o in result] == [dict(height=10), dict(height=20)]
@@ -1,3 +1,5 @@
+import pytest
+
 from solid_state.query import *
 
 
@@ -29,3 +31,57 @@ def test_parse():
             Path([Term(state_name="baz"), Term(obj_name="zig")]),
         ]
     )
+
+
+def test_parse_negation():
+    assert parse(":not(.foo)") == Query(
+        [Path([Term(negations=[Term(state_name="foo")])])]
+    )
+    assert parse("foo:not(.bar)") == Query(
+        [Path([Term(obj_name="foo", negations=[Term(state_name="bar")])])]
+    )
+    assert parse(".foo :not(bar, zig.baz)") == Query(
+        [
+            Path(
+                [
+                    Term(state_name="foo"),
+                    Term(
+                        negations=[
+                            Term(obj_name="bar"),
+                            Term(obj_name="zig", state_name="baz"),
+                        ]
+                    ),
+                ]
+            )
+        ]
+    )
+    assert parse("foo:not(.bar):not(.baz), zig") == Query(
+        [
+            Path(
+                [
+                    Term(
+                        obj_name="foo",
+                        negations=[Term(state_name="bar"), Term(state_name="baz")],
+                    )
+                ]
+            ),
+            Path([Term(obj_name="zig")]),
+        ]
+    )
+
+
+def test_parse_within():
+    assert parse(".foo:within(0, 0, 0, 1.5, 2, 3)") == Query(
+        [Path([Term(state_name="foo", within=(0, 0, 0, 1.5, 2, 3))])]
+    )
+    assert parse(":within(-1,-1,-1,1,1,1):not(.foo)") == Query(
+        [Path([Term(negations=[Term(state_name="foo")], within=(-1, -1, -1, 1, 1, 1))])]
+    )
+
+    # several boxes are combined into their overlap
+    assert parse("cube:within(0,0,0,2,2,2):within(1,-1,1,3,3,1.5)") == Query(
+        [Path([Term(obj_name="cube", within=(1, 0, 1, 2, 2, 1.5))])]
+    )
+
+    with pytest.raises(Exception):
+        parse(".foo:within(0, 0, 1)")
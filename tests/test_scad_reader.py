@@ -0,0 +1,72 @@
+import solid
+
+from solid_state.lookup import get_objects
+from solid_state.render import render_scad, scad_text
+from solid_state.scad_reader import count_scad_objects, get_scad_objects, scan_scad
+from solid_state.solid_state import join, pipe, save_state
+
+from tests.conftest import create_snowman
+
+
+def create_scene():
+    return pipe(
+        create_snowman(10),
+        solid.translate([10, 0, 0]),
+        join(create_snowman(20)),
+        join(save_state("sign", dict(text="hi (there) {}; */"))(solid.text("hi (there) {};"))),
+        save_state("scene"),
+    )
+
+
+def test_scad_text():
+    scene = create_scene()
+
+    assert scad_text(scene) == scene._render()
+    assert scad_text(scene, annotate=True).count("/* solid_state ") == 4
+
+
+def test_scan_scad(tmp_path):
+    file_path = tmp_path / "scene.scad"
+    render_scad(create_scene(), file_path, colorize=False, annotate=True)
+
+    matches = list(scan_scad(file_path, ".snowman"))
+
+    assert [m.state_name for m in matches] == ["snowman", "snowman"]
+    assert [m.attributes for m in matches] == [dict(height=10), dict(height=20)]
+    assert matches[0].text.startswith("/* solid_state ")
+    assert matches[0].text.count("sphere") == 2
+
+    for query, exclude in [
+        ("sphere", None),
+        (".scene .snowman sphere", None),
+        (".snowman, .sign", None),
+        ("translate:not(.snowman)", None),
+        ("sphere", ".snowman"),
+        (".sign text", None),
+    ]:
+        expected = len(get_objects(create_scene(), query, exclude))
+        assert count_scad_objects(file_path, query, exclude) == expected
+
+    assert get_scad_objects(file_path, ".sign text") == ['text(text = "hi (there) {};");']
+
+
+def test_scan_scad_nested(tmp_path):
+    file_path = tmp_path / "scene.scad"
+    render_scad(create_scene(), file_path, colorize=False, annotate=True)
+
+    matches = list(scan_scad(file_path, "translate"))
+
+    # inner matches are found before the objects containing them
+    assert matches[-1].state_name == "scene"
+    assert len(matches) == 7
+
+
+def test_scan_scad_module(tmp_path):
+    file_path = tmp_path / "scene.scad"
+    file_path.write_text(
+        "module snowman(height) {\n\tsphere(d = height);\n}\n"
+        "translate(v = [1, 2, 3]) {\n\tsnowman(height = 10);\n\tsphere(d = 5);\n}\n"
+    )
+
+    assert count_scad_objects(file_path, "sphere") == 1
+    assert get_scad_objects(file_path, "translate snowman") == ["snowman(height = 10);"]
@@ -0,0 +1,94 @@
+import importlib.util
+import os
+
+import solid
+
+from solid_state.frozen import freeze, get_indices, thaw
+from solid_state.lookup import get_attributes, get_objects
+from solid_state.serialize import _PackedRecords, dump_scene, load_scene
+from solid_state.solid_state import save_state
+
+
+def create_scene():
+    obj1 = save_state("my-cube", dict(alpha=1, beta=[1, 2.5]))(solid.cube([1, 2, 3]))
+    obj2 = save_state("my-sphere", dict(alpha=2))(solid.sphere(r=2.5, segments=12))
+    obj3 = solid.color("red")(solid.cylinder(h=10, d=4, center=True))
+    obj3.add_trait("other", dict(gamma=3))
+    parent = save_state("parent", dict(size=10))(
+        solid.translate([1, 2, 3])(obj1 + obj2.set_modifier("#") + obj3)
+    )
+
+    return solid.rotate(a=45, v=[0, 0, 1])(parent)
+
+
+def test_dump_load_scene(tmp_path):
+    scad_obj = create_scene()
+    file_path = tmp_path / "scene.bin"
+
+    dump_scene(scad_obj, file_path)
+
+    for kwargs in [dict(), dict(mmap_mode=True), dict(lazy=True), dict(mmap_mode=True, lazy=True)]:
+        scene = load_scene(file_path, **kwargs)
+
+        assert len(scene) == len(freeze(scad_obj))
+        assert solid.scad_render(thaw(scene)) == solid.scad_render(scad_obj)
+        assert get_attributes(scene, ".my-cube") == dict(alpha=1, beta=[1, 2.5])
+        assert get_attributes(scene, ".parent") == dict(size=10)
+        assert len(get_objects(scene, ".parent sphere")) == 1
+        assert thaw(scene).children[0].children[0].children[0].children[2].get_trait("other") == dict(gamma=3)
+
+
+def test_load_scene_lazy(tmp_path):
+    file_path = tmp_path / "scene.bin"
+    dump_scene(freeze(create_scene()), file_path)
+
+    scene = load_scene(file_path, lazy=True)
+
+    assert isinstance(scene.attributes, _PackedRecords)
+    assert scene.attributes._cache == {}
+
+    get_objects(scene, ".my-sphere")
+
+    # only the attributes of the thawed subtree were decoded
+    assert [int(k) for k in scene.attributes._cache] == list(get_indices(scene, ".my-sphere"))
+
+
+def test_params_types(tmp_path):
+    scad_obj = solid.translate([1, 2.0, 3])(solid.cube(size=5, center=False))
+    file_path = tmp_path / "scene.bin"
+    dump_scene(scad_obj, file_path)
+
+    scene = load_scene(file_path)
+
+    assert scene.params[0] == dict(v=[1, 2.0, 3])
+    assert [type(v) for v in scene.params[0]["v"]] == [int, float, int]
+    assert scene.params[1] == dict(size=5, center=False)
+    assert type(scene.params[1]["size"]) is int
+    assert type(scene.params[1]["center"]) is bool
+
+
+def test_params_constants(tmp_path):
+    scad_obj = solid.cylinder(h=10, d=4, center=True) + solid.cube(1, center=False)
+    file_path = tmp_path / "scene.bin"
+    dump_scene(scad_obj, file_path)
+
+    for kwargs in [dict(), dict(lazy=True)]:
+        scene = load_scene(file_path, **kwargs)
+        assert [dict(p) for p in scene.params] == [dict(p) for p in freeze(scad_obj).params]
+
+    # None and bools are packed, not pickled
+    assert len(load_scene(file_path, lazy=True).params._objects) == 0
+
+
+def test_example_round_trip(tmp_path):
+    example_path = os.path.join(os.path.dirname(__file__), "..", "examples", "snowmen.py")
+    spec = importlib.util.spec_from_file_location("snowmen", example_path)
+    snowmen = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(snowmen)
+
+    file_path = tmp_path / "scene.bin"
+    dump_scene(snowmen.scene, file_path)
+
+    for kwargs in [dict(), dict(lazy=True)]:
+        scene = load_scene(file_path, **kwargs)
+        assert solid.scad_render(thaw(scene)) == solid.scad_render(snowmen.scene)
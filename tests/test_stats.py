@@ -0,0 +1,84 @@
+import json
+
+from click.testing import CliRunner
+import solid
+
+from solid_state.cli import main
+from solid_state.solid_state import instrument, join, pipe, save_state, state
+from solid_state.stats import format_table, scene_stats
+
+from tests.conftest import create_snowman
+
+
+def with_nose(scad_obj):
+    return pipe(scad_obj, join(save_state("nose")(solid.cylinder(h=1, d=0.5))))
+
+
+@state("snowmen")
+def create_snowmen():
+    return with_nose(create_snowman(10)) + with_nose(create_snowman(10)) + with_nose(create_snowman(20))
+
+
+def test_scene_stats():
+    results = {s.name: s for s in scene_stats(create_snowmen())}
+
+    assert list(results) == ["snowmen", "snowman", "nose"]
+
+    snowman = results["snowman"]
+    assert snowman.instances == 3
+    assert snowman.nodes == 3 * 5
+    # the two 10 high snowmen are identical
+    assert snowman.unique_nodes == 5 + 5
+    assert snowman.max_depth == 3
+    assert snowman.primitives == dict(sphere=6)
+    assert snowman.scad_size > 0
+    assert snowman.calls is None
+
+    assert results["snowmen"].instances == 1
+    assert results["snowmen"].nodes == 3 * 8 + 1
+    assert results["snowmen"].max_depth == 6
+    assert results["nose"].primitives == dict(cylinder=3)
+    # the noses are shared
+    assert results["nose"].unique_nodes == 2
+
+
+def test_scene_stats_instrumentation():
+    with instrument() as instrumentation:
+        scene = create_snowmen()
+
+    # only collected inside of instrument
+    create_snowman(10)
+
+    assert instrumentation["snowman"]["calls"] == 3
+    assert instrumentation["snowmen"]["calls"] == 1
+
+    results = {s.name: s for s in scene_stats(scene, instrumentation)}
+
+    assert results["snowman"].calls == 3
+    assert results["snowman"].construction_time > 0
+    assert results["snowmen"].construction_time >= results["snowman"].construction_time
+    assert results["snowmen"].allocated > 0
+    assert results["nose"].calls is None
+
+
+def test_format_table():
+    table = format_table(scene_stats(create_snowmen()))
+    lines = table.split("\n")
+
+    assert len(lines) == 4
+    assert lines[0].split()[:3] == ["name", "instances", "nodes"]
+    assert lines[2].startswith("snowman ")
+
+
+def test_stats_command(tmp_path, monkeypatch):
+    (tmp_path / "stats_target.py").write_text(
+        "from tests.test_stats import create_snowmen\n"
+        "scene = create_snowmen()\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    result = CliRunner().invoke(main, ["stats", "stats_target:create_snowmen", "--json"])
+
+    # the scene built while importing the module isn't counted
+    calls = {s["name"]: s["calls"] for s in json.loads(result.output)}
+    assert calls == dict(snowmen=1, snowman=3, nose=None)